@@ -0,0 +1,91 @@
+"""
+FIFI Answer Cache - Reuse model answers for repeated questions
+Answers are keyed on the normalized question plus a hash of the context it was
+answered from, so a changed page or static answer never serves a stale reply.
+"""
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Words that usually point back at earlier turns ("what about parking for it?")
+FOLLOW_UP_WORDS = frozenset("""
+it its that this those these they them their theirs there he she him her his hers
+one ones same more else also too again above previous earlier before instead then
+""".split())
+
+FOLLOW_UP_OPENERS = ('what about', 'how about', 'and ', 'but ', 'so ', 'why', 'what else')
+
+PUNCTUATION_RE = re.compile(r"[^\w\s]")
+
+
+def normalize_query(query):
+    """Lowercase a question and strip punctuation and extra whitespace"""
+    return ' '.join(PUNCTUATION_RE.sub(' ', query.lower()).split())
+
+
+def is_self_contained(query, conversation_history):
+    """Check whether a question means the same thing regardless of earlier turns"""
+    if not conversation_history:
+        return True
+    normalized = normalize_query(query)
+    if normalized.startswith(FOLLOW_UP_OPENERS):
+        return False
+    return not any(word in FOLLOW_UP_WORDS for word in normalized.split())
+
+
+class AnswerCache:
+    """Thread-safe LRU cache of answers with a TTL and hit/miss counters"""
+
+    def __init__(self, ttl=60 * 60, max_entries=1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, query, context):
+        context_hash = hashlib.sha1(context.encode('utf-8')).hexdigest()
+        return normalize_query(query), context_hash
+
+    def get(self, query, context):
+        """Return the cached answer for a question and context, or None"""
+        key = self._key(query, context)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[1] >= self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, query, context, answer):
+        """Store an answer, evicting the least recently used entries past max_entries"""
+        key = self._key(query, context)
+        with self._lock:
+            self._entries[key] = (answer, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def bypass(self):
+        """Count a question that could not use the cache because it depends on history"""
+        with self._lock:
+            self.bypassed += 1
+
+    def stats(self):
+        """Return the cache counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'bypassed': self.bypassed,
+            }
@@ -11,9 +11,105 @@ def load_api_key():
     with open(key_file, 'r') as f:
         return f.read().strip()
 
-OPENAI_API_KEY = load_api_key()
+# OPENAI_API_KEY is read on first access, so tools that never call OpenAI don't need the key file
+def __getattr__(name):
+    if name == 'OPENAI_API_KEY':
+        globals()[name] = load_api_key()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Optional: Model configuration
 MODEL_NAME = "gpt-3.5-turbo"  # or "gpt-4" if you have access
 MAX_TOKENS = 1000
 TEMPERATURE = 0.7
+
+# Page cache configuration (extracted page text, keyed by URL)
+PAGE_CACHE_PATH = os.path.join(os.path.dirname(__file__), "page_cache.db")
+PAGE_CACHE_TTL = 6 * 60 * 60  # seconds before a cached page is revalidated
+PAGE_CACHE_MAX_BYTES = 50 * 1024 * 1024  # least recently used pages are evicted past this size
+PAGE_CACHE_TOUCH_INTERVAL = 5  # seconds; a hit only rewrites a page's last-used time once it is this old
+
+# Background refresh of the most requested pages (live page fetches only, not the corpus snapshot)
+PREFETCH_ENABLED = True
+PREFETCH_HOT_URLS = 50  # most requested pages kept fresh
+PREFETCH_INTERVAL = 60  # seconds between refresh passes
+PREFETCH_REFRESH_AHEAD = 0.2  # refresh pages in the last 20% of PAGE_CACHE_TTL
+PREFETCH_WORKERS = 4  # pages refreshed concurrently
+PREFETCH_JITTER = 0.2  # pass intervals vary by +/-20%; refreshes are spread over 20% of the interval
+PREFETCH_DECAY = 0.9  # request counts shrink by this factor every pass so the hot set follows traffic
+
+# Context retrieval configuration
+FETCH_WORKERS = 16  # pages fetched concurrently across all requests
+CONTEXT_DEADLINE = 4.0  # seconds to wait for context pages before answering without the slow ones
+
+# Offline corpus snapshot built by `python corpus.py`
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "corpus.bin")
+SEARCH_INDEX_PATH = os.path.join(os.path.dirname(__file__), "search_index.bin")  # built by `python search_index.py`
+
+# Passage retrieval configuration
+PAGE_TEXT_LIMIT = 20000  # characters of page text kept per fetched page
+PASSAGE_CHARS = 800  # passage length used when splitting pages
+PASSAGE_OVERLAP = 200  # characters shared by neighbouring passages
+PASSAGE_CANDIDATES = 12  # top passages considered for each question
+CONTEXT_CHAR_BUDGET = 3000  # characters of passage text packed into the prompt
+
+# Snapshot retrieval: "lexical" (BM25), "dense" (vectors, needs NumPy) or "hybrid" (both, fused)
+RETRIEVAL_MODE = "hybrid"
+VECTOR_INDEX_PATH = os.path.join(os.path.dirname(__file__), "vector_index.npz")  # built by `python vector_index.py`
+VECTOR_DIM = 256
+
+# Answer cache for repeated questions
+ANSWER_CACHE_TTL = 60 * 60  # seconds an answer is reused
+ANSWER_CACHE_MAX_ENTRIES = 1000
+
+# Conversation history storage: "memory" (per process) or "sqlite" (shared by worker processes)
+SESSION_BACKEND = "memory"
+SESSION_DB_PATH = os.path.join(os.path.dirname(__file__), "sessions.db")
+SESSION_IDLE_TIMEOUT = 30 * 60  # seconds of inactivity before a conversation is forgotten
+SESSION_MAX_SESSIONS = 10000
+SESSION_MAX_BYTES = 50 * 1024 * 1024  # least recently used conversations are evicted past this size
+SESSION_TOUCH_INTERVAL = 5  # seconds; the sqlite backend only rewrites a session's last-used time once it is this old
+
+# Shared HTTP connection pool for page fetches and crawling
+HTTP_POOL_CONNECTIONS = 10  # hosts to keep connection pools for
+HTTP_POOL_MAXSIZE = 16  # keep-alive connections per host
+HTTP_POOL_BLOCK = False  # wait for a free connection instead of exceeding HTTP_POOL_MAXSIZE
+HTTP_RETRIES = 2
+HTTP_BACKOFF_FACTOR = 0.3  # retry delays: 0.3s, 0.6s, 1.2s, ...
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# OpenAI client connection pool
+OPENAI_MAX_CONNECTIONS = 50
+OPENAI_MAX_KEEPALIVE = 20
+OPENAI_KEEPALIVE_EXPIRY = 30  # seconds an idle connection stays open
+OPENAI_TIMEOUT = 60
+OPENAI_MAX_RETRIES = 2
+
+# Crawler (scrape_iu_southbend.py)
+CRAWL_MAX_PAGES = 20000
+CRAWL_WORKERS = 16  # pages fetched concurrently across all hosts
+CRAWL_HOST_DELAY = 0.5  # minimum seconds between requests to the same host
+CRAWL_HOST_CONCURRENCY = 2  # requests in flight per host
+CRAWL_STATE_PATH = os.path.join(os.path.dirname(__file__), "crawl_state.db")  # validators and hashes from the last crawl
+
+# HTML text extraction (uses lxml when installed, otherwise html.parser)
+EXTRACT_MAX_BYTES = 2 * 1024 * 1024  # stop reading a page's HTML after this many bytes
+
+# Tiered answering: "tiered" answers confident static knowledge base matches directly,
+# "llm" always sends the question to the model
+ANSWER_MODE = "tiered"
+STATIC_DIRECT_CONFIDENCE = 0.8  # static matches at least this confident skip the model
+STATIC_CONTEXT_CONFIDENCE = 0.5  # weaker static matches are given to the model as context; below this, web pages are used
+
+# Prompt token budgets (counted with tiktoken when installed, otherwise estimated)
+MODEL_CONTEXT_WINDOW = 16385  # tokens the model accepts (prompt + completion)
+PROMPT_TOKEN_BUDGET = 2500  # system prompt + history + context + question
+HISTORY_TOKEN_BUDGET = 600  # conversation summary and recent turns
+HISTORY_RECENT_MESSAGES = 4  # messages kept word for word; older ones are folded into the summary
+SUMMARY_TOKEN_BUDGET = 200  # size of the rolling summary of older turns
+
+# Batch questions (/chat/batch and `fifi_chatbot.py --batch`)
+BATCH_MAX_QUESTIONS = 500  # questions accepted in one batch
+BATCH_RETRIEVAL_WORKERS = 16  # questions retrieving context at the same time
+BATCH_MODEL_CONCURRENCY = 8  # model calls in flight per batch
+BATCH_FETCH_WORKERS = 4  # context pages a batch fetches at once, in its own pool so live chats keep the shared one
@@ -1,191 +1,25 @@
 """
 FIFI Web Application - Flask Backend
 IU South Bend Information Chatbot
+Routes only; answering lives in engine.py, which is shared with async_app.py and fifi_chatbot.py.
 """
 
-from flask import Flask, render_template, request, jsonify
-import os
-import requests
-from bs4 import BeautifulSoup
-from openai import OpenAI
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
+import json
+import time
 
-# Import API configuration
-from api_config import OPENAI_API_KEY, MODEL_NAME, MAX_TOKENS, TEMPERATURE
-
-# Import static knowledge base
-from knowledge_base import get_static_answer
+from engine import chat_with_fifi, stream_chat_with_fifi, answer_batch, batch_error, record_turn, start_prefetcher
+from engine import get_urls, get_corpus, get_session_store
+from engine import metrics, request_seconds, responses_total
+from metrics import CONTENT_TYPE
 
 app = Flask(__name__)
 
-# Initialize OpenAI client
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-# Store conversation history (in production, use sessions or database)
-conversation_histories = {}
-
-
-def load_urls(filepath="iu_southbend_urls.txt"):
-    """Load scraped URLs from file"""
-    urls = []
-    if os.path.exists(filepath):
-        with open(filepath, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#'):
-                    urls.append(line)
-    return urls
-
-
-def fetch_page_content(url, timeout=10):
-    """Fetch and extract text content from a URL"""
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=timeout)
-        response.raise_for_status()
-
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        for element in soup(['script', 'style', 'nav', 'footer', 'header']):
-            element.decompose()
-
-        text = soup.get_text(separator=' ', strip=True)
-        return text[:3000]
-    except Exception:
-        return None
-
-
-def find_relevant_urls(urls, query):
-    """Find URLs that might be relevant to the query"""
-    keywords = query.lower().split()
-    relevant = []
-
-    keyword_patterns = {
-        'admission': ['admission', 'apply', 'enroll'],
-        'tuition': ['tuition', 'cost', 'fee', 'bursar', 'financial'],
-        'financial': ['financial', 'aid', 'scholarship', 'bursar'],
-        'program': ['program', 'academic', 'degree', 'major'],
-        'course': ['course', 'class', 'schedule', 'registrar'],
-        'housing': ['housing', 'residence', 'dorm'],
-        'parking': ['parking', 'transportation'],
-        'library': ['library', 'libguide', 'libguides', 'circulation', 'reserves', 'reserve', 'book', 'borrow', 'checkout', 'printing', 'print', '3d', 'werc', 'policy', 'librarian', 'research', 'hours', 'schurz', 'subject-librarian', 'research-support', 'wideformat', 'room', 'study', 'room-reservation'],
-        'career': ['career', 'job', 'internship', 'handshake'],
-        'transfer': ['transfer'],
-        'graduate': ['graduate', 'grad', 'master'],
-        'international': ['international', 'oiss', 'visa'],
-        'calendar': ['calendar', 'schedule', 'date'],
-        'contact': ['contact', 'phone', 'email'],
-        'visit': ['visit', 'tour', 'campus'],
-        'student': ['student', 'service'],
-        'orientation': ['orientation', 'new-student'],
-        'faculty': ['faculty', 'professor', 'staff', 'directory', 'people', 'dr', 'doctor'],
-        'computer': ['computer', 'computer-science', 'computer-science-informatics', 'cs', 'computing', 'informatics', 'clas'],
-        'math': ['math', 'mathematics', 'applied'],
-        'business': ['business', 'mba', 'accounting', 'management'],
-        'nursing': ['nursing', 'health', 'nurse'],
-        'education': ['education', 'teaching', 'teacher'],
-        'arts': ['arts', 'music', 'theatre', 'art', 'performance'],
-    }
-
-    matched_patterns = set()
-    for keyword in keywords:
-        for pattern, url_keywords in keyword_patterns.items():
-            if keyword in url_keywords or any(k in keyword for k in url_keywords):
-                matched_patterns.update(url_keywords)
-
-    if not matched_patterns:
-        matched_patterns = set(keywords)
-
-    # Prioritize URLs with more pattern matches and faculty/people pages
-    scored_urls = []
-    for url in urls:
-        url_lower = url.lower()
-        score = 0
-        for pattern in matched_patterns:
-            if pattern in url_lower:
-                score += 1
-        # Boost faculty/people pages
-        if 'faculty' in url_lower or 'people' in url_lower or 'staff' in url_lower:
-            score += 2
-        if score > 0:
-            scored_urls.append((url, score))
-
-    # Sort by score descending and return top 8
-    scored_urls.sort(key=lambda x: x[1], reverse=True)
-    return [url for url, score in scored_urls[:8]]
-
-
-def get_context_from_urls(urls, query):
-    """Fetch content from relevant URLs to use as context"""
-    relevant_urls = find_relevant_urls(urls, query)
-    context_parts = []
-
-    for url in relevant_urls[:3]:
-        content = fetch_page_content(url)
-        if content:
-            context_parts.append(f"Source: {url}\n{content[:1500]}")
-
-    return "\n\n---\n\n".join(context_parts) if context_parts else ""
-
-
-def chat_with_fifi(query, urls, conversation_history):
-    """Send query to OpenAI with context from IU South Bend URLs"""
-
-    # First, check static knowledge base for instant answers
-    static_answer = get_static_answer(query)
-    if static_answer:
-        # Use static knowledge as primary context
-        context = f"VERIFIED INFORMATION:\n{static_answer}"
-    else:
-        # Fall back to fetching from URLs
-        context = get_context_from_urls(urls, query)
-
-    system_message = """You are FIFI, a friendly and helpful chatbot assistant for IU South Bend (Indiana University South Bend).
-Your purpose is to help students, prospective students, and visitors find information about IU South Bend.
-
-Guidelines:
-- Be friendly, helpful, and professional
-- Use the provided context from IU South Bend web pages to answer questions
-- If you don't have specific information, suggest relevant resources or direct users to contact the appropriate office
-- Always mention relevant URLs from the context when applicable
-- If a question is not related to IU South Bend, politely redirect to IU South Bend topics
-- Keep responses concise but informative
-- Format your responses nicely with line breaks where appropriate"""
-
-    messages = [{"role": "system", "content": system_message}]
-
-    for msg in conversation_history[-6:]:
-        messages.append(msg)
-
-    user_message = query
-    if context:
-        user_message = f"""Question: {query}
-
-Here is relevant information from IU South Bend website:
-
-{context}
-
-Please answer the question based on this information."""
-
-    messages.append({"role": "user", "content": user_message})
-
-    try:
-        response = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=messages,
-            max_tokens=MAX_TOKENS,
-            temperature=TEMPERATURE
-        )
-
-        return response.choices[0].message.content
-
-    except Exception as e:
-        return f"I'm sorry, I encountered an error: {str(e)}"
-
 
-# Load URLs at startup
-urls = load_urls()
+@app.before_request
+def start_background_refresh():
+    """Start the page prefetcher with the first request this process serves (a no-op after that)"""
+    start_prefetcher()
 
 
 @app.route('/')
@@ -204,24 +38,82 @@ def chat():
     if not user_message:
         return jsonify({'error': 'No message provided'}), 400
 
-    # Get or create conversation history for this session
-    if session_id not in conversation_histories:
-        conversation_histories[session_id] = []
+    start = time.perf_counter()
 
-    history = conversation_histories[session_id]
+    # Get conversation history for this session
+    history = get_session_store().get(session_id)
 
     # Get response from FIFI
-    response = chat_with_fifi(user_message, urls, history)
+    response, sources, tier = chat_with_fifi(user_message, get_urls(), history)
 
     # Update conversation history
-    history.append({"role": "user", "content": user_message})
-    history.append({"role": "assistant", "content": response})
+    record_turn(session_id, user_message, response)
+
+    responses_total.inc(tier)
+    request_seconds.observe(time.perf_counter() - start, '/chat')
+    return jsonify({'response': response, 'sources': sources, 'tier': tier})
+
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Handle chat messages, streaming the response as Server-Sent Events.
+
+    Each event carries JSON: {"delta": text} for every chunk, then
+    {"done": true, "sources": [...], "tier": ...} once the response is complete.
+    """
+    data = request.json
+    user_message = data.get('message', '')
+    session_id = data.get('session_id', 'default')
+
+    if not user_message:
+        return jsonify({'error': 'No message provided'}), 400
+
+    start = time.perf_counter()
+    history = get_session_store().get(session_id)
+    chunks, sources, tier = stream_chat_with_fifi(user_message, get_urls(), history)
+
+    def events():
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield f"data: {json.dumps({'delta': chunk})}\n\n"
+
+        # Update conversation history once the whole response has been sent
+        record_turn(session_id, user_message, "".join(parts))
+        responses_total.inc(tier)
+        request_seconds.observe(time.perf_counter() - start, '/chat/stream')
+        yield f"data: {json.dumps({'done': True, 'sources': sources, 'tier': tier})}\n\n"
 
-    # Keep only last 10 messages
-    if len(history) > 10:
-        conversation_histories[session_id] = history[-10:]
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream_with_context(events()), mimetype='text/event-stream', headers=headers)
 
-    return jsonify({'response': response})
+
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    """Answer a list of independent questions, streaming results as newline-delimited JSON.
+
+    Each line is {"index", "question", "response", "sources", "tier", "seconds"}
+    for one question, in the order they finish, followed by
+    {"done": true, "count": ..., "seconds": ...}.
+    No conversation history is read or written.
+    """
+    data = request.json
+    questions = data.get('questions')
+
+    error = batch_error(questions)
+    if error:
+        return jsonify({'error': error}), 400
+
+    start = time.perf_counter()
+
+    def lines():
+        for result in answer_batch(questions, get_urls()):
+            responses_total.inc(result['tier'])
+            yield json.dumps(result) + "\n"
+        request_seconds.observe(time.perf_counter() - start, '/chat/batch')
+        yield json.dumps({'done': True, 'count': len(questions), 'seconds': round(time.perf_counter() - start, 3)}) + "\n"
+
+    return Response(stream_with_context(lines()), mimetype='application/x-ndjson', headers={'X-Accel-Buffering': 'no'})
 
 
 @app.route('/clear', methods=['POST'])
@@ -230,13 +122,21 @@ def clear_history():
     data = request.json
     session_id = data.get('session_id', 'default')
 
-    if session_id in conversation_histories:
-        conversation_histories[session_id] = []
+    get_session_store().clear(session_id)
 
     return jsonify({'status': 'cleared'})
 
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Expose stage latencies and counters in Prometheus text format"""
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+
 if __name__ == '__main__':
     print(f"FIFI Web App starting...")
-    print(f"Loaded {len(urls)} IU South Bend URLs")
+    print(f"Loaded {len(get_urls())} IU South Bend URLs")
+    corpus = get_corpus()
+    if corpus is not None:
+        print(f"Serving page text from corpus snapshot ({len(corpus)} pages)")
     app.run(debug=True, port=5000)
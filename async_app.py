@@ -0,0 +1,397 @@
+"""
+FIFI Web Application - asyncio serving mode
+Serves the same routes and JSON contract as app.py from a single aiohttp
+process. Page fetches use aiohttp and model calls use the async OpenAI client,
+so chats waiting on upstream I/O don't each hold a worker thread. Every other
+step (retrieval, caching, prompt assembly, batching) is engine.py's, run in
+worker threads when it touches SQLite or is CPU-bound so it never blocks the
+event loop.
+
+Run with: python async_app.py
+"""
+
+import asyncio
+import json
+import os
+import time
+
+from aiohttp import web, ClientSession, ClientTimeout, TCPConnector
+
+import api_config
+from api_config import CONTEXT_DEADLINE, PAGE_TEXT_LIMIT, EXTRACT_MAX_BYTES
+from api_config import HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE
+from api_config import BATCH_MODEL_CONCURRENCY
+
+# Retrieval, caches, indexes and the session store are shared with the WSGI app
+import engine as fifi
+from html_extract import CHUNK_SIZE, ByteStreamExtractor, charset_from_content_type
+from http_pool import USER_AGENT, openai_client_options
+from metrics import CONTENT_TYPE
+from singleflight import AsyncSingleFlight
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'index.html')
+
+
+@fifi.lazy
+def get_aclient():
+    """The async OpenAI client, created on the first model call"""
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=api_config.OPENAI_API_KEY, **openai_client_options(async_client=True))
+
+
+# Fetches that missed the deadline keep running so their pages land in the cache
+background_fetches = set()
+
+# Collapse concurrent identical page downloads and model calls into one
+page_fetches = AsyncSingleFlight()
+question_flights = AsyncSingleFlight()
+stream_flights = AsyncSingleFlight()
+
+# /metrics reports them in the fifi_coalescing groups, with the engine's flights the prefetcher still uses
+fifi.coalescing_groups['page_fetches'].append(page_fetches)
+fifi.coalescing_groups['questions'].append(question_flights)
+fifi.coalescing_groups['streams'].append(stream_flights)
+
+
+async def fetch_page_content(http, url, timeout=10):
+    """Async version of engine.fetch_page_content for pages outside a corpus snapshot"""
+    # Concurrent requests for the same page share one download
+    return await page_fetches.do(url, lambda: load_page_content(http, url, timeout))
+
+
+async def load_page_content(http, url, timeout=10):
+    """Async version of engine.load_page_content; only the download itself runs on the event loop"""
+    # The page cache is SQLite, so its reads and writes run in worker threads
+    page_cache = fifi.get_page_cache()
+    cached = await asyncio.to_thread(page_cache.get, url)
+    if cached and page_cache.is_fresh(cached):
+        return cached.text
+
+    with fifi.stage_seconds.time('download'):
+        try:
+            headers = page_cache.validators(cached) if cached else {}
+
+            async with http.get(url, headers=headers, timeout=ClientTimeout(total=timeout)) as response:
+                if cached and response.status == 304:
+                    return await asyncio.to_thread(fifi.page_not_modified, url, cached)
+                response.raise_for_status()
+
+                # Parse chunks as they arrive and stop downloading once there is enough text
+                extractor = ByteStreamExtractor(PAGE_TEXT_LIMIT, EXTRACT_MAX_BYTES,
+                                                charset_from_content_type(response.headers.get('Content-Type')))
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    # Parsing is CPU-bound, keep it off the event loop
+                    await asyncio.to_thread(extractor.feed, chunk)
+                    if extractor.done:
+                        break
+                text = await asyncio.to_thread(extractor.text)
+
+            return await asyncio.to_thread(fifi.store_page, url, text, response.headers.get('ETag'),
+                                           response.headers.get('Last-Modified'))
+        except Exception:
+            return fifi.page_download_failed(cached)
+
+
+async def get_context_from_urls(http, query, deadline=CONTEXT_DEADLINE):
+    """Async version of engine.get_context_from_urls; only the page downloads run on the event loop"""
+    # Snapshot search, URL routing and passage ranking are CPU-bound, keep them off the event loop
+    context, sources, to_fetch = await asyncio.to_thread(fifi.local_context, fifi.get_urls(), query)
+    if not to_fetch:
+        return context, sources
+
+    tasks = [(url, asyncio.create_task(fetch_page_content(http, url))) for url in to_fetch]
+    with fifi.stage_seconds.time('fetch'):
+        done, _ = await asyncio.wait([task for _, task in tasks], timeout=deadline)
+
+    pages = []
+    for url, task in tasks:
+        if task in done:
+            pages.append((url, task.result()))
+        else:
+            fifi.drop_slow_source(url, deadline)
+            background_fetches.add(task)
+            task.add_done_callback(background_fetches.discard)
+
+    return await asyncio.to_thread(fifi.context_from_pages, query, pages)
+
+
+async def retrieve_context(http, query):
+    """Async version of engine.retrieve_context"""
+    static = fifi.static_context(query)
+    if static is not None:
+        return static
+    context, sources = await get_context_from_urls(http, query)
+    return context, sources, 'llm-retrieval'
+
+
+async def chat_with_fifi(http, query, conversation_history, model_slots=None):
+    """Async version of engine.chat_with_fifi; model_slots optionally limits concurrent model calls"""
+    answer = fifi.direct_answer(query, conversation_history)
+    if answer is not None:
+        return answer, [], 'static'
+
+    context, sources, tier = await retrieve_context(http, query)
+
+    answer, request = await asyncio.to_thread(fifi.prepare_prompt, query, context, conversation_history)
+    if request is None:
+        return answer, sources, 'cache'
+
+    async def call_model():
+        with fifi.stage_seconds.time('model'):
+            try:
+                response = await get_aclient().chat.completions.create(**fifi.completion_options(request))
+            except Exception:
+                fifi.model_errors_total.inc()
+                raise
+        fifi.record_usage(response.usage)
+        return fifi.finish_answer(request, response.choices[0].message.content)
+
+    async def complete():
+        if model_slots is None:
+            return await call_model()
+        async with model_slots:
+            return await call_model()
+
+    try:
+        if not request.shared:
+            return await complete(), sources, tier
+        # Identical new-conversation questions asked at the same time share one model call
+        return await question_flights.do(fifi.question_key(query, context), complete), sources, tier
+
+    except Exception as e:
+        return fifi.error_answer(e), sources, tier
+
+
+async def answer_batch(http, questions, model_concurrency=BATCH_MODEL_CONCURRENCY):
+    """Async version of engine.answer_batch: an async iterator of results in the order they finish"""
+    start = time.perf_counter()
+
+    # Every question retrieves its context at once; only the model calls wait for a slot
+    model_slots = asyncio.Semaphore(model_concurrency)
+
+    async def answer(indexes):
+        try:
+            response, sources, tier = await chat_with_fifi(http, questions[indexes[0]], [], model_slots)
+        except Exception as e:
+            response, sources, tier = fifi.error_answer(e), [], 'error'
+        return indexes, response, sources, tier
+
+    tasks = [asyncio.create_task(answer(indexes)) for indexes in fifi.batch_groups(questions)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            indexes, response, sources, tier = await next_done
+            for result in fifi.batch_results(questions, indexes, response, sources, tier, start):
+                yield result
+    finally:
+        # The client went away: stop the questions that are still running
+        for task in tasks:
+            task.cancel()
+
+
+async def single_chunk(text):
+    """An async chunk iterator for an answer that is already complete"""
+    yield text
+
+
+async def stream_chat_with_fifi(http, query, conversation_history):
+    """Async version of engine.stream_chat_with_fifi; returns an async chunk iterator, sources and tier"""
+    answer = fifi.direct_answer(query, conversation_history)
+    if answer is not None:
+        return single_chunk(answer), [], 'static'
+
+    context, sources, tier = await retrieve_context(http, query)
+
+    answer, request = await asyncio.to_thread(fifi.prepare_prompt, query, context, conversation_history)
+    if request is None:
+        return single_chunk(answer), sources, 'cache'
+
+    async def generate():
+        parts = []
+        start = time.perf_counter()
+        try:
+            stream = await get_aclient().chat.completions.create(
+                **fifi.completion_options(request),
+                stream=True,
+                stream_options={'include_usage': True}
+            )
+            async for chunk in stream:
+                delta = fifi.stream_delta(chunk)
+                if delta:
+                    if not parts:
+                        fifi.stage_seconds.observe(time.perf_counter() - start, 'model_first_token')
+                    parts.append(delta)
+                    yield delta
+        except Exception as e:
+            fifi.model_errors_total.inc()
+            yield fifi.error_answer(e)
+            return
+        fifi.stage_seconds.observe(time.perf_counter() - start, 'model')
+        fifi.finish_answer(request, "".join(parts))
+
+    if not request.shared:
+        return generate(), sources, tier
+    return stream_flights.share(fifi.question_key(query, context), generate).__aiter__(), sources, tier
+
+
+async def read_chat_request(request):
+    """Parse a chat request body the same way the Flask routes do"""
+    try:
+        data = await request.json()
+    except json.JSONDecodeError:
+        raise web.HTTPBadRequest(text=json.dumps({'error': 'Invalid JSON'}), content_type='application/json')
+    return data.get('message', ''), data.get('session_id', 'default')
+
+
+async def home(request):
+    """Render the main chat interface"""
+    return web.FileResponse(TEMPLATE_PATH)
+
+
+async def chat(request):
+    """Handle chat messages"""
+    user_message, session_id = await read_chat_request(request)
+
+    if not user_message:
+        return web.json_response({'error': 'No message provided'}, status=400)
+
+    start = time.perf_counter()
+    history = await asyncio.to_thread(fifi.get_session_store().get, session_id)
+
+    response, sources, tier = await chat_with_fifi(request.app['http'], user_message, history)
+
+    await asyncio.to_thread(fifi.record_turn, session_id, user_message, response)
+
+    fifi.responses_total.inc(tier)
+    fifi.request_seconds.observe(time.perf_counter() - start, '/chat')
+    return web.json_response({'response': response, 'sources': sources, 'tier': tier})
+
+
+async def chat_stream(request):
+    """Handle chat messages, streaming the response as Server-Sent Events"""
+    user_message, session_id = await read_chat_request(request)
+
+    if not user_message:
+        return web.json_response({'error': 'No message provided'}, status=400)
+
+    start = time.perf_counter()
+    history = await asyncio.to_thread(fifi.get_session_store().get, session_id)
+    chunks, sources, tier = await stream_chat_with_fifi(request.app['http'], user_message, history)
+
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    await response.prepare(request)
+
+    parts = []
+    async for chunk in chunks:
+        parts.append(chunk)
+        await response.write(f"data: {json.dumps({'delta': chunk})}\n\n".encode('utf-8'))
+
+    await asyncio.to_thread(fifi.record_turn, session_id, user_message, "".join(parts))
+    fifi.responses_total.inc(tier)
+    fifi.request_seconds.observe(time.perf_counter() - start, '/chat/stream')
+    await response.write(f"data: {json.dumps({'done': True, 'sources': sources, 'tier': tier})}\n\n".encode('utf-8'))
+    await response.write_eof()
+    return response
+
+
+async def chat_batch(request):
+    """Answer a list of independent questions, streaming results as newline-delimited JSON"""
+    try:
+        data = await request.json()
+    except json.JSONDecodeError:
+        return web.json_response({'error': 'Invalid JSON'}, status=400)
+    questions = data.get('questions')
+
+    error = fifi.batch_error(questions)
+    if error:
+        return web.json_response({'error': error}, status=400)
+
+    start = time.perf_counter()
+    response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson', 'X-Accel-Buffering': 'no'})
+    await response.prepare(request)
+
+    async for result in answer_batch(request.app['http'], questions):
+        fifi.responses_total.inc(result['tier'])
+        await response.write((json.dumps(result) + "\n").encode('utf-8'))
+
+    fifi.request_seconds.observe(time.perf_counter() - start, '/chat/batch')
+    done = {'done': True, 'count': len(questions), 'seconds': round(time.perf_counter() - start, 3)}
+    await response.write((json.dumps(done) + "\n").encode('utf-8'))
+    await response.write_eof()
+    return response
+
+
+async def metrics_endpoint(request):
+    """Expose stage latencies and counters in Prometheus text format"""
+    return web.Response(body=fifi.metrics.render().encode('utf-8'), headers={'Content-Type': CONTENT_TYPE})
+
+
+async def clear_history(request):
+    """Clear conversation history"""
+    _, session_id = await read_chat_request(request)
+
+    await asyncio.to_thread(fifi.get_session_store().clear, session_id)
+
+    return web.json_response({'status': 'cleared'})
+
+
+async def open_http_session(application):
+    """Create the shared keep-alive HTTP client session for page fetches"""
+    connector = TCPConnector(
+        limit=HTTP_POOL_CONNECTIONS * HTTP_POOL_MAXSIZE,
+        limit_per_host=HTTP_POOL_MAXSIZE,
+        keepalive_timeout=30
+    )
+    application['http'] = ClientSession(connector=connector, headers={'User-Agent': USER_AGENT})
+
+
+async def close_http_session(application):
+    """Close the shared HTTP client session and the OpenAI client"""
+    await application['http'].close()
+    if get_aclient.loaded():
+        await get_aclient().close()
+
+
+async def load_snapshot(application):
+    """Load the corpus snapshot and its indexes before serving, so no request builds them on the event loop"""
+    await asyncio.to_thread(fifi.warm_up)
+
+
+async def start_background_refresh(application):
+    """Start the page prefetcher in this worker process"""
+    await asyncio.to_thread(fifi.start_prefetcher)
+
+
+async def stop_background_refresh(application):
+    """Stop the page prefetcher's refresh thread, if this worker started it"""
+    if fifi.get_prefetcher.loaded():
+        fifi.get_prefetcher().stop()
+
+
+def create_app():
+    """Build the aiohttp application with the same routes as app.py"""
+    application = web.Application()
+    application.router.add_get('/', home)
+    application.router.add_post('/chat', chat)
+    application.router.add_post('/chat/stream', chat_stream)
+    application.router.add_post('/chat/batch', chat_batch)
+    application.router.add_post('/clear', clear_history)
+    application.router.add_get('/metrics', metrics_endpoint)
+    application.on_startup.append(open_http_session)
+    application.on_startup.append(load_snapshot)
+    application.on_startup.append(start_background_refresh)
+    application.on_cleanup.append(stop_background_refresh)
+    application.on_cleanup.append(close_http_session)
+    return application
+
+
+if __name__ == '__main__':
+    print("FIFI Web App (async) starting...")
+    print(f"Loaded {len(fifi.get_urls())} IU South Bend URLs")
+    corpus = fifi.get_corpus()
+    if corpus is not None:
+        print(f"Serving page text from corpus snapshot ({len(corpus)} pages)")
+    web.run_app(create_app(), port=5000)
@@ -0,0 +1,112 @@
+"""
+Benchmark: streaming HTML text extraction vs the original BeautifulSoup path
+Checks that the extractors return the same text as BeautifulSoup, then reports
+throughput and peak memory (tracemalloc) for each text limit.
+
+Usage: python benchmarks/bench_extract.py [directory of saved .html pages]
+Without a directory, synthetic pages shaped like iusb.edu pages are used.
+"""
+
+import glob
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bs4 import BeautifulSoup
+
+from html_extract import etree, extract_text
+
+LIMITS = [3000, 20000, None]
+
+
+def legacy_extract(html, limit=None):
+    """The original fetch_page_content extraction: full tree, decompose, get_text, then truncate"""
+    soup = BeautifulSoup(html, 'html.parser')
+    for element in soup(['script', 'style', 'nav', 'footer', 'header']):
+        element.decompose()
+    text = soup.get_text(separator=' ', strip=True)
+    return text[:limit] if limit is not None else text
+
+
+def synthetic_pages(count=40):
+    """Pages with a heavy header/nav, inline scripts and a long body, like the university site"""
+    nav = "".join(f'<li><a href="/section-{i}/index.html">Section {i}</a></li>' for i in range(300))
+    script = "<script>window.dataLayer = window.dataLayer || [];" + "var x = '<div>';" * 200 + "</script>"
+    pages = []
+    for n in range(count):
+        paragraphs = "".join(
+            f"<p>Paragraph {i} of page {n}: the library, admissions &amp; bursar offices are open "
+            f"Monday&ndash;Friday. <a href='/p{i}'>More</a> information <b>here</b>.</p>"
+            for i in range(400)
+        )
+        pages.append(
+            "<!DOCTYPE html><html><head><title>IU South Bend</title>"
+            "<style>body { margin: 0 } .nav { display: flex }</style>" + script + "</head><body>"
+            f"<header><div class='brand'>Indiana University South Bend</div><nav><ul>{nav}</ul></nav></header>"
+            f"<main><h1>Page {n}</h1>{paragraphs}</main>"
+            f"<footer><ul>{nav}</ul><p>Copyright 2024</p></footer></body></html>"
+        )
+    return pages
+
+
+def load_pages(directory):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.htm*'))):
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            pages.append(f.read())
+    return pages
+
+
+def measure(extract, pages, limit):
+    """Return (seconds, peak traced bytes) for extracting every page once"""
+    start = time.perf_counter()
+    for html in pages:
+        extract(html, limit)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    for html in pages:
+        extract(html, limit)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    pages = load_pages(sys.argv[1]) if len(sys.argv) > 1 else synthetic_pages()
+    if not pages:
+        print("No .html pages found")
+        return
+    total_mb = sum(len(html.encode('utf-8')) for html in pages) / (1024 * 1024)
+
+    extractors = [('beautifulsoup', legacy_extract),
+                  ('stream/html.parser', lambda html, limit: extract_text(html, limit, 'html.parser'))]
+    if etree is not None:
+        extractors.append(('stream/lxml', lambda html, limit: extract_text(html, limit, 'lxml')))
+
+    print("HTML Text Extraction Benchmark")
+    print("=" * 72)
+    print(f"{len(pages)} pages, {total_mb:.1f} MB of HTML")
+
+    for name, extract in extractors[1:]:
+        same = sum(extract(html, None) == legacy_extract(html) for html in pages)
+        print(f"{name}: {same}/{len(pages)} pages identical to BeautifulSoup output")
+
+    for limit in LIMITS:
+        print(f"\nText limit: {limit if limit is not None else 'none'}")
+        print(f"{'extractor':<20} {'pages/s':>9} {'MB/s':>8} {'peak MB':>9} {'speedup':>8}")
+        print("-" * 58)
+        baseline = None
+        for name, extract in extractors:
+            elapsed, peak = measure(extract, pages, limit)
+            baseline = baseline or elapsed
+            print(f"{name:<20} {len(pages) / elapsed:>9.1f} {total_mb / elapsed:>8.1f} "
+                  f"{peak / (1024 * 1024):>9.1f} {baseline / elapsed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
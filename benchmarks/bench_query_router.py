@@ -0,0 +1,124 @@
+"""
+Micro-benchmark: precompiled QueryRouter vs the original find_relevant_urls
+Checks that both give identical results, then times them on the real URL list
+and on synthetic lists of increasing size.
+
+Usage: python benchmarks/bench_query_router.py
+"""
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from engine import KEYWORD_PATTERNS, URL_BOOST_TERMS
+from query_router import QueryRouter
+
+QUERIES = [
+    "What are the library hours?",
+    "How do I reserve a study room?",
+    "How do I borrow a book?",
+    "What are the printing services?",
+    "Who is the chair of computer science?",
+    "How much is tuition for graduate students?",
+    "Where can I park on campus?",
+    "international student visa requirements",
+    "When is the last date to drop a class",
+    "nursing program admission",
+    "zzz unknown words here",
+    # No pattern matches: the router matches these against whole URL path words, which
+    # agrees with the original substring check whenever the word is a whole path word
+    "hdp guest",
+    "",
+]
+
+
+def legacy_find_relevant_urls(urls, query):
+    """The original find_relevant_urls from app.py"""
+    keywords = query.lower().split()
+    keyword_patterns = KEYWORD_PATTERNS
+
+    matched_patterns = set()
+    for keyword in keywords:
+        for pattern, url_keywords in keyword_patterns.items():
+            if keyword in url_keywords or any(k in keyword for k in url_keywords):
+                matched_patterns.update(url_keywords)
+
+    if not matched_patterns:
+        matched_patterns = set(keywords)
+
+    scored_urls = []
+    for url in urls:
+        url_lower = url.lower()
+        score = 0
+        for pattern in matched_patterns:
+            if pattern in url_lower:
+                score += 1
+        if 'faculty' in url_lower or 'people' in url_lower or 'staff' in url_lower:
+            score += 2
+        if score > 0:
+            scored_urls.append((url, score))
+
+    scored_urls.sort(key=lambda x: x[1], reverse=True)
+    return [url for url, score in scored_urls[:8]]
+
+
+def load_urls(filepath):
+    urls = []
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                urls.append(line)
+    return urls
+
+
+def scale_urls(urls, size):
+    """Grow the URL list to `size` entries by cloning it under new paths"""
+    scaled = []
+    copy = 0
+    while len(scaled) < size:
+        for url in urls:
+            scaled.append(url if copy == 0 else f"{url.rstrip('/')}/copy{copy}")
+            if len(scaled) == size:
+                break
+        copy += 1
+    return scaled
+
+
+def time_per_call(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in QUERIES:
+            fn(query)
+    return (time.perf_counter() - start) / (repeat * len(QUERIES)) * 1e6
+
+
+def main():
+    base_urls = load_urls(os.path.join(ROOT, "iu_southbend_urls.txt"))
+
+    print(f"{'URLs':>8} {'legacy us/query':>16} {'router us/query':>16} {'speedup':>8} {'build ms':>9}")
+    for size in (len(base_urls), 1500, 15000):
+        urls = scale_urls(base_urls, size)
+
+        start = time.perf_counter()
+        router = QueryRouter(KEYWORD_PATTERNS, urls, boost_terms=URL_BOOST_TERMS)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        for query in QUERIES:
+            expected = legacy_find_relevant_urls(urls, query)
+            actual = router.route(query, limit=8)
+            if expected != actual:
+                print(f"MISMATCH for {query!r} at {size} URLs:\n  legacy: {expected}\n  router: {actual}")
+                sys.exit(1)
+
+        repeat = max(1, 3000 // size)
+        legacy_us = time_per_call(lambda q: legacy_find_relevant_urls(urls, q), repeat)
+        router_us = time_per_call(lambda q: router.route(q, limit=8), repeat * 10)
+        print(f"{size:>8} {legacy_us:>16.1f} {router_us:>16.1f} {legacy_us / router_us:>7.0f}x {build_ms:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Benchmark: offline retrieval latency and relevance on the golden question set
+Runs every question in golden_queries.json through the static knowledge base,
+find_relevant_urls and get_context_from_urls against a saved corpus snapshot
+(no network), then reports p50/p95/p99 latency and throughput for each stage,
+static topic and direct-answer accuracy and recall@k of the expected source URLs.
+
+Usage: python benchmarks/bench_retrieval.py [--corpus corpus.bin] [--repeat 5]
+                                            [--json report.json] [--compare old_report.json]
+Save a report for each release with --json; --compare prints the changes
+against an older report and exits with status 1 if anything regressed.
+"""
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import api_config
+from api_config import STATIC_CONTEXT_CONFIDENCE, STATIC_DIRECT_CONFIDENCE
+
+GOLDEN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden_queries.json')
+RECALL_KS = (1, 3, 8)
+STAGES = ('static', 'route', 'context')
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def latency_summary(samples):
+    """p50/p95/p99/mean in milliseconds and calls per second for a list of timings in seconds"""
+    ordered = sorted(samples)
+    total = sum(ordered)
+    return {
+        'calls': len(ordered),
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+        'mean_ms': round(total / len(ordered) * 1000, 3) if ordered else 0.0,
+        'per_second': round(len(ordered) / total, 1) if total else 0.0,
+    }
+
+
+def recall(expected, found):
+    """Fraction of the expected URLs that were found"""
+    return len(set(expected) & set(found)) / len(expected) if expected else 1.0
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_engine(corpus_path):
+    """Import engine.py against the given snapshot, keeping its indexes next to the snapshot"""
+    if corpus_path:
+        api_config.CORPUS_PATH = corpus_path
+        api_config.SEARCH_INDEX_PATH = corpus_path + '.search_index'
+        api_config.VECTOR_INDEX_PATH = corpus_path + '.vector_index'
+    import engine
+    return engine
+
+
+def run(engine, golden, repeat):
+    """Time every stage for every golden question and score the results of the last pass"""
+    timings = {stage: [] for stage in STAGES}
+    results = []
+    for _ in range(repeat):
+        results = []
+        for item in golden['queries']:
+            query = item['query']
+
+            start = time.perf_counter()
+            match = engine.match_static_answer(query)
+            routed = time.perf_counter()
+            urls = engine.find_relevant_urls(engine.get_urls(), query)
+            contexted = time.perf_counter()
+            _, sources = engine.get_context_from_urls(engine.get_urls(), query)
+            end = time.perf_counter()
+
+            timings['static'].append(routed - start)
+            timings['route'].append(contexted - routed)
+            timings['context'].append(end - contexted)
+            # A weak match is neither used as context nor answered directly, so it counts as no topic
+            confidence = match.confidence if match else 0.0
+            results.append({
+                'id': item['id'],
+                'static_topic': match.topic if confidence >= STATIC_CONTEXT_CONFIDENCE else None,
+                'static_direct': confidence >= STATIC_DIRECT_CONFIDENCE,
+                'urls': urls,
+                'sources': sources,
+            })
+    return timings, results
+
+
+def relevance(golden, results):
+    """Static topic and direct-answer accuracy, recall@k of find_relevant_urls and recall of the context sources"""
+    static_misses, direct_misses, context_misses = [], [], []
+    direct_checked = 0
+    route_recall = {k: 0.0 for k in RECALL_KS}
+    context_recall = 0.0
+    for item, result in zip(golden['queries'], results):
+        if result['static_topic'] != item['static_topic']:
+            static_misses.append(item['id'])
+        if 'direct' in item:
+            direct_checked += 1
+            if result['static_direct'] != item['direct']:
+                direct_misses.append(item['id'])
+        for k in RECALL_KS:
+            route_recall[k] += recall(item['expected_urls'], result['urls'][:k])
+        score = recall(item['expected_urls'], result['sources'])
+        context_recall += score
+        if score == 0:
+            context_misses.append(item['id'])
+
+    count = len(results)
+    report = {'static_accuracy': round(1 - len(static_misses) / count, 4)}
+    if direct_checked:
+        report['direct_accuracy'] = round(1 - len(direct_misses) / direct_checked, 4)
+    for k in RECALL_KS:
+        report[f'route_recall@{k}'] = round(route_recall[k] / count, 4)
+    report['context_recall'] = round(context_recall / count, 4)
+    report['static_misses'] = static_misses
+    report['direct_misses'] = direct_misses
+    report['context_misses'] = context_misses
+    return report
+
+
+def compare(old, new, tolerance, min_delta_ms):
+    """Print metric changes against an older report; return the list of regressions"""
+    regressions = []
+    if old.get('golden_version') != new['golden_version']:
+        print(f"Note: golden set version changed ({old.get('golden_version')} -> {new['golden_version']}), "
+              "relevance numbers are not directly comparable")
+
+    print(f"\nChanges since {old.get('commit') or 'baseline'}:")
+    print(f"{'metric':<28} {'old':>10} {'new':>10} {'change':>9}")
+    print("-" * 60)
+    for stage in STAGES:
+        for field in ('p50_ms', 'p95_ms', 'p99_ms'):
+            before = old.get('stages', {}).get(stage, {}).get(field)
+            after = new['stages'][stage][field]
+            if before is None:
+                continue
+            change = (after - before) / before if before else 0.0
+            flag = ''
+            # Sub-millisecond stages jitter by more than the tolerance between runs
+            if field == 'p95_ms' and change > tolerance and after - before > min_delta_ms:
+                regressions.append(f"{stage} {field}")
+                flag = '  <- slower'
+            print(f"{stage + ' ' + field:<28} {before:>10.3f} {after:>10.3f} {change:>+8.0%}{flag}")
+    for name, after in new['relevance'].items():
+        before = old.get('relevance', {}).get(name)
+        if isinstance(after, list) or before is None:
+            continue
+        flag = ''
+        if after < before:
+            regressions.append(name)
+            flag = '  <- worse'
+        print(f"{name:<28} {before:>10.4f} {after:>10.4f} {after - before:>+9.4f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline retrieval benchmark on the golden question set")
+    parser.add_argument('--corpus', help="corpus snapshot to search (default: CORPUS_PATH)")
+    parser.add_argument('--golden', default=GOLDEN_FILE, help="golden question set")
+    parser.add_argument('--repeat', type=int, default=5, help="passes over the question set")
+    parser.add_argument('--json', help="write the report to this file")
+    parser.add_argument('--compare', help="an earlier report to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed relative p95 slowdown")
+    parser.add_argument('--min-delta-ms', type=float, default=0.25, help="ignore p95 slowdowns smaller than this")
+    args = parser.parse_args()
+
+    engine = load_engine(args.corpus)
+    corpus = engine.get_corpus()
+    if corpus is None:
+        print(f"No corpus snapshot at {api_config.CORPUS_PATH}. Build one first: python corpus.py")
+        return 2
+
+    with open(args.golden, 'r', encoding='utf-8') as f:
+        golden = json.load(f)
+
+    # One untimed pass so index loading and first-use setup don't count
+    run(engine, golden, 1)
+    timings, results = run(engine, golden, args.repeat)
+
+    report = {
+        'benchmark': 'retrieval',
+        'golden_version': golden['version'],
+        'commit': git_commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'corpus': {'pages': len(corpus), 'built_at': corpus.built_at},
+        'retrieval_mode': engine.RETRIEVAL_MODE,
+        'vector_index': engine.get_vector_index() is not None,
+        'repeat': args.repeat,
+        'stages': {stage: latency_summary(timings[stage]) for stage in STAGES},
+        'relevance': relevance(golden, results),
+        'queries': results,
+    }
+
+    print("Retrieval Benchmark")
+    print("=" * 72)
+    print(f"{len(golden['queries'])} golden questions (set v{golden['version']}) x {args.repeat} passes, "
+          f"{len(corpus)} pages, mode {engine.RETRIEVAL_MODE}")
+    print(f"\n{'stage':<10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'mean ms':>9} {'calls/s':>10}")
+    print("-" * 60)
+    for stage, summary in report['stages'].items():
+        print(f"{stage:<10} {summary['p50_ms']:>9.3f} {summary['p95_ms']:>9.3f} {summary['p99_ms']:>9.3f} "
+              f"{summary['mean_ms']:>9.3f} {summary['per_second']:>10.1f}")
+
+    print()
+    for name, value in report['relevance'].items():
+        if isinstance(value, list):
+            print(f"{name:<20} {', '.join(value) or '-'}")
+        else:
+            print(f"{name:<20} {value:.4f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\nReport written to {args.json}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            old = json.load(f)
+        regressions = compare(old, report, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print(f"\nRegressions: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""
+Benchmark: compiled static-answer rules vs the original get_static_answer chain
+Checks that both return the same answer for every question in
+static_rule_queries.txt and for randomly generated combinations of rule terms,
+then times them on the real rule table and on synthetic tables with more rules.
+
+Usage: python benchmarks/bench_static_rules.py
+"""
+
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from knowledge_base import LIBRARY_INFO, ADMISSIONS_INFO, CAMPUS_INFO, CS_DEPARTMENT_INFO
+from knowledge_base import STATIC_RULES, get_static_answer, match_static_answer
+from rule_engine import RuleEngine
+
+QUERIES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static_rule_queries.txt')
+FILLER = ['what', 'is', 'the', 'a', 'how', 'do', 'i', 'iu', 'south', 'bend', 'campus', 'student',
+          'please', 'tell', 'me', 'about', 'for', 'my', 'on', 'can']
+
+
+def legacy_get_static_answer(query):
+    """The original if-chain from knowledge_base.get_static_answer"""
+    query_lower = query.lower()
+
+    # Library hours
+    if any(word in query_lower for word in ['hour', 'open', 'close', 'when']):
+        if 'library' in query_lower or 'schurz' in query_lower:
+            return LIBRARY_INFO["hours"]
+
+    # Room reservation
+    if any(word in query_lower for word in ['room', 'study room', 'reserve', 'reservation', 'book a room']):
+        if 'study' in query_lower or 'room' in query_lower or 'conference' in query_lower:
+            return LIBRARY_INFO["room_reservation"]
+
+    # Borrowing books
+    if any(word in query_lower for word in ['borrow', 'checkout', 'check out', 'loan', 'renew']):
+        if 'book' in query_lower or 'library' in query_lower:
+            return LIBRARY_INFO["borrowing"]
+
+    # Printing
+    if any(word in query_lower for word in ['print', 'printing', 'printer', 'scan', 'scanner', '3d print']):
+        return LIBRARY_INFO["printing"]
+
+    # Subject librarians
+    if 'librarian' in query_lower and ('subject' in query_lower or 'who' in query_lower):
+        return LIBRARY_INFO["subject_librarians"]
+
+    # Specific librarian for a subject
+    if 'librarian' in query_lower:
+        if 'computer' in query_lower or 'math' in query_lower or 'informatics' in query_lower:
+            return "The subject librarian for Computer Science, Informatics, and Mathematical Sciences is KIRBY CHENG.\nSchedule an appointment: https://libcal.iusb.edu/appointments/kirbycheng"
+        if 'nursing' in query_lower or 'health' in query_lower or 'psychology' in query_lower:
+            return "The subject librarian for Health Sciences, Nursing, and Psychology is SUSAN THOMAS.\nSchedule an appointment: https://libcal.iusb.edu/appointments/susanthomas"
+        if 'business' in query_lower or 'education' in query_lower:
+            return "The subject librarian for Education is SCOTT OPASIK.\nSchedule an appointment: https://libcal.iusb.edu/appointments/scottopasik"
+
+    # Course reserves
+    if 'reserve' in query_lower and ('course' in query_lower or 'class' in query_lower or 'textbook' in query_lower):
+        return LIBRARY_INFO["reserves"]
+
+    # WERC services
+    if 'werc' in query_lower or ('laminator' in query_lower) or ('die cut' in query_lower) or ('button' in query_lower and 'make' in query_lower):
+        return LIBRARY_INFO["werc_services"]
+
+    # Admissions
+    if any(word in query_lower for word in ['admission', 'apply', 'application', 'requirement', 'enroll']):
+        return ADMISSIONS_INFO["requirements"]
+
+    # Tuition
+    if any(word in query_lower for word in ['tuition', 'cost', 'fee', 'price', 'how much', 'financial aid', 'fafsa']):
+        return ADMISSIONS_INFO["tuition"]
+
+    # Parking
+    if 'parking' in query_lower or 'park' in query_lower:
+        return CAMPUS_INFO["parking"]
+
+    # Campus map
+    if 'map' in query_lower or 'where' in query_lower and 'building' in query_lower:
+        return CAMPUS_INFO["maps"]
+
+    # Contact info
+    if 'contact' in query_lower or 'phone' in query_lower or 'call' in query_lower or 'address' in query_lower:
+        return CAMPUS_INFO["contact"]
+
+    # CS Department / Dana Vrajitoru
+    if 'dana' in query_lower or 'vrajitoru' in query_lower:
+        return CS_DEPARTMENT_INFO
+    if 'computer science' in query_lower and ('chair' in query_lower or 'department' in query_lower or 'head' in query_lower):
+        return CS_DEPARTMENT_INFO
+
+    return None
+
+
+def load_queries(path=QUERIES_FILE):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def random_queries(count, seed=42):
+    """Questions built from random rule terms and filler words, to exercise rule precedence"""
+    rng = random.Random(seed)
+    terms = sorted({term for rule in STATIC_RULES for term in rule['triggers'] + rule.get('requires', [])})
+    queries = []
+    for _ in range(count):
+        words = rng.sample(terms, rng.randint(1, 3)) + rng.sample(FILLER, rng.randint(0, 5))
+        rng.shuffle(words)
+        query = ' '.join(words)
+        queries.append(query.upper() if rng.random() < 0.1 else query)
+    return queries
+
+
+def sequential_match(rules, query):
+    """Evaluate a rule table one rule at a time, the way the original chain did"""
+    query_lower = query.lower()
+    for rule in rules:
+        if any(term in query_lower for term in rule['triggers']):
+            requires = rule.get('requires')
+            if not requires or any(term in query_lower for term in requires):
+                return rule['answer']
+    return None
+
+
+def synthetic_rules(count, seed=7):
+    """A rule table shaped like STATIC_RULES with `count` made-up topics"""
+    rng = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+
+    def word():
+        return ''.join(rng.choice(letters) for _ in range(rng.randint(4, 9)))
+
+    rules = []
+    for i in range(count):
+        rule = {'topic': f'topic{i}', 'triggers': [word() for _ in range(rng.randint(1, 5))],
+                'answer': f'answer{i}', 'weight': 0.8}
+        if rng.random() < 0.5:
+            rule['requires'] = [word() for _ in range(rng.randint(1, 3))]
+        rules.append(rule)
+    return rules
+
+
+def time_per_query(func, queries, rounds=20):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for query in queries:
+            func(query)
+    return (time.perf_counter() - start) / (rounds * len(queries))
+
+
+def main():
+    corpus = load_queries()
+    generated = random_queries(20000)
+
+    print("Static Answer Rules Benchmark")
+    print("=" * 60)
+
+    for name, queries in [("question corpus", corpus), ("random term combinations", generated)]:
+        mismatches = [q for q in queries if get_static_answer(q) != legacy_get_static_answer(q)]
+        answered = sum(get_static_answer(q) is not None for q in queries)
+        print(f"{name}: {len(queries)} questions, {answered} answered, {len(mismatches)} mismatches")
+        for query in mismatches[:10]:
+            print(f"  MISMATCH: {query!r}")
+        if mismatches:
+            sys.exit(1)
+
+    print("\nTopics and confidence for the question corpus:")
+    for query in corpus:
+        match = match_static_answer(query)
+        label = f"{match.topic} ({match.confidence:.2f})" if match else "-"
+        print(f"  {query[:48]:<48} {label}")
+
+    queries = corpus + generated[:2000]
+    legacy = time_per_query(legacy_get_static_answer, queries)
+    compiled = time_per_query(get_static_answer, queries)
+    print(f"\n{'implementation':<16} {'us/query':>10}")
+    print("-" * 28)
+    print(f"{'if-chain':<16} {legacy * 1e6:>10.2f}")
+    print(f"{'compiled rules':<16} {compiled * 1e6:>10.2f}")
+    print(f"Speedup: {legacy / compiled:.1f}x")
+
+    # The chain's cost grows with the number of rules, the compiled matcher's with the question length
+    print(f"\n{'rules':>6} {'sequential us':>14} {'compiled us':>12} {'speedup':>8}")
+    print("-" * 44)
+    for count in [20, 200, 2000]:
+        rules = synthetic_rules(count)
+        engine = RuleEngine(rules)
+        terms = [term for rule in rules for term in rule['triggers'] + rule.get('requires', [])]
+        rng = random.Random(count)
+        queries = [' '.join(rng.sample(terms, 2) + rng.sample(FILLER, 6)) for _ in range(500)]
+        queries += [' '.join(rng.sample(FILLER, 8)) for _ in range(500)]
+        for query in queries:
+            match = engine.match(query)
+            assert (match.answer if match else None) == sequential_match(rules, query)
+        sequential = time_per_query(lambda query: sequential_match(rules, query), queries, rounds=3)
+        compiled = time_per_query(engine.match, queries, rounds=3)
+        print(f"{count:>6} {sequential * 1e6:>14.1f} {compiled * 1e6:>12.1f} {sequential / compiled:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+"""
+Load test: concurrent /chat and /clear traffic against a local FIFI server
+Starts a stand-in for the OpenAI chat-completions API (configurable latency and
+token streaming), a static HTTP server with iusb.edu pages and the web app
+itself in a separate process pointed at both. Then drives /chat (or
+/chat/stream) and /clear from many session ids at stepped concurrency levels
+and reports throughput, latency percentiles, error rates and the server's
+resident memory for each level, so you can see where the workers saturate.
+
+Usage: python benchmarks/load_test.py [--levels 1,4,16,64] [--duration 15] [--app flask|async]
+                                      [--pages saved_pages_dir] [--model-latency 0.3]
+                                      [--tokens 80] [--token-delay 0.01] [--stream] [--cold]
+                                      [--json report.json]
+Saved pages are laid out as <dir>/<host>/<path> (what `wget -x` produces);
+without --pages, synthetic pages are generated for every URL in
+iu_southbend_urls.txt. --cold turns off the answer cache and revalidates every
+page, so each question reaches the page server and the model stub.
+Nothing leaves the machine: page and model requests all go to the local stubs.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import requests
+
+try:
+    import psutil
+except ImportError:  # psutil is optional, /proc is used on Linux
+    psutil = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+GOLDEN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden_queries.json')
+ERROR_PREFIX = "I'm sorry, I encountered an error"
+
+
+class StubOpenAIHandler(BaseHTTPRequestHandler):
+    """Answers POST /v1/chat/completions like the OpenAI API, after a configurable delay"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_event(self, payload):
+        self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+        self.wfile.flush()
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        stub = self.server
+        prompt_tokens = sum(len(m.get('content') or '') for m in request.get('messages', [])) // 4
+        tokens = min(stub.tokens, request.get('max_tokens') or stub.tokens)
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': tokens,
+                 'total_tokens': prompt_tokens + tokens}
+        words = [f" word{i}" for i in range(tokens)]
+        base = {'id': 'chatcmpl-stub', 'created': int(time.time()), 'model': request.get('model', 'stub')}
+
+        # Time to first token
+        time.sleep(stub.latency)
+
+        if not request.get('stream'):
+            time.sleep(stub.token_delay * tokens)
+            self.send_json({**base, 'object': 'chat.completion', 'usage': usage, 'choices': [
+                {'index': 0, 'message': {'role': 'assistant', 'content': ''.join(words)}, 'finish_reason': 'stop'}]})
+            return
+
+        # Stream without a length and close the connection at the end, like a chunked upstream
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        chunk = {**base, 'object': 'chat.completion.chunk'}
+        for word in words:
+            self.send_event({**chunk, 'choices': [{'index': 0, 'delta': {'content': word}, 'finish_reason': None}]})
+            time.sleep(stub.token_delay)
+        self.send_event({**chunk, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]})
+        if (request.get('stream_options') or {}).get('include_usage'):
+            self.send_event({**chunk, 'choices': [], 'usage': usage})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class QuietPageHandler(SimpleHTTPRequestHandler):
+    """Serves saved pages (with Last-Modified / 304 support) without logging every request"""
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_stub_openai(latency, tokens, token_delay):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubOpenAIHandler)
+    server.daemon_threads = True
+    server.latency, server.tokens, server.token_delay = latency, tokens, token_delay
+    return start_server(server)
+
+
+def start_page_server(directory):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), lambda *args: QuietPageHandler(*args, directory=directory))
+    server.daemon_threads = True
+    return start_server(server)
+
+
+def page_path(url):
+    """Where a page is stored under the page directory: <host>/<path>, index.html for directory-like paths"""
+    parts = urlsplit(url)
+    path = parts.netloc + (parts.path or '/')
+    if '.' not in path.rsplit('/', 1)[-1]:
+        path = path.rstrip('/') + '/index.html'
+    return path
+
+
+def read_urls(path):
+    """URLs from a url list file, skipping blank lines and comments"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def write_synthetic_pages(urls, directory):
+    """Write a plausible page for every URL, with navigation chrome and topic words from the URL"""
+    nav = "".join(f'<li><a href="/section-{i}.html">Section {i}</a></li>' for i in range(120))
+    for url in urls:
+        path = os.path.join(directory, page_path(url))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        topic = " ".join(word for word in urlsplit(url).path.replace('.html', '').replace('-', ' ').split('/') if word)
+        topic = topic or urlsplit(url).netloc.split('.')[0]
+        body = "".join(f"<p>Information about {topic} at IU South Bend for students, item {i}. "
+                       f"Contact the office about {topic} hours, fees and requirements.</p>" for i in range(120))
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"<html><head><title>{topic}</title><script>var a = 1;</script></head><body>"
+                    f"<header><nav><ul>{nav}</ul></nav></header><main><h1>{topic}</h1>{body}</main>"
+                    f"<footer><ul>{nav}</ul></footer></body></html>")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def rss_bytes(pid):
+    """Resident set size of a process, or None if it can't be read"""
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return None
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(1, math.ceil(fraction * len(sorted_values))) - 1]
+
+
+def serve(argv):
+    """Child process: run the web app against the stubs, with its state in a scratch directory"""
+    parser = argparse.ArgumentParser(prog='load_test.py serve')
+    parser.add_argument('--port', type=int, required=True)
+    parser.add_argument('--urls', required=True)
+    parser.add_argument('--state', required=True)
+    parser.add_argument('--app', choices=['flask', 'async'], default='flask')
+    parser.add_argument('--cold', action='store_true')
+    args = parser.parse_args(argv)
+
+    import api_config
+    api_config.OPENAI_API_KEY = 'sk-load-test'  # the stub model server accepts any key; no api_key.txt needed
+    api_config.CORPUS_PATH = os.path.join(args.state, 'no_corpus.bin')  # always fetch from the page server
+    api_config.PAGE_CACHE_PATH = os.path.join(args.state, 'page_cache.db')
+    api_config.SESSION_DB_PATH = os.path.join(args.state, 'sessions.db')
+    api_config.PREFETCH_ENABLED = False
+    if args.cold:
+        api_config.ANSWER_CACHE_TTL = 0
+        api_config.PAGE_CACHE_TTL = 0
+
+    import engine
+    engine.get_urls.set(engine.load_urls(args.urls))
+    if args.app == 'flask':
+        import app
+        app.app.run(host='127.0.0.1', port=args.port, threaded=True)
+    else:
+        from aiohttp import web
+        import async_app
+        web.run_app(async_app.create_app(), host='127.0.0.1', port=args.port, print=None)
+
+
+def wait_until_up(base_url, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        try:
+            if requests.get(base_url + '/', timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server did not start within {timeout}s")
+
+
+def client_loop(base_url, path, stop_at, questions, sessions, clear_ratio, rng, results):
+    """One simulated client: keep sending requests until stop_at, recording (route, seconds, ok, tier)"""
+    http = requests.Session()
+    while time.perf_counter() < stop_at:
+        session_id = f"load-{rng.randrange(sessions)}"
+        start = time.perf_counter()
+        try:
+            if rng.random() < clear_ratio:
+                response = http.post(base_url + '/clear', json={'session_id': session_id}, timeout=120)
+                results.append(('clear', time.perf_counter() - start, response.status_code == 200, None))
+                continue
+            response = http.post(base_url + path, json={'message': rng.choice(questions),
+                                                        'session_id': session_id}, timeout=120)
+            ok = response.status_code == 200
+            if ok and path == '/chat':
+                data = response.json()
+                ok, tier = not data['response'].startswith(ERROR_PREFIX), data.get('tier')
+            elif ok:
+                done = json.loads(response.text.rstrip().rsplit('data: ', 1)[-1])
+                ok, tier = ERROR_PREFIX not in response.text, done.get('tier')
+            else:
+                tier = None
+            results.append(('chat', time.perf_counter() - start, ok, tier))
+        except (requests.RequestException, ValueError, KeyError):
+            results.append(('chat', time.perf_counter() - start, False, None))
+
+
+def run_level(base_url, pid, concurrency, duration, args, questions):
+    """Drive the server with `concurrency` clients for `duration` seconds and summarize"""
+    results = []
+    peak_rss = [rss_bytes(pid) or 0]
+    stop_at = time.perf_counter() + duration
+    clients = [
+        threading.Thread(target=client_loop, args=(
+            base_url, '/chat/stream' if args.stream else '/chat', stop_at, questions,
+            args.sessions, args.clear_ratio, random.Random(args.seed * 1000 + i), results))
+        for i in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+    while any(client.is_alive() for client in clients):
+        peak_rss[0] = max(peak_rss[0], rss_bytes(pid) or 0)
+        time.sleep(0.25)
+    elapsed = time.perf_counter() - start
+
+    chats = sorted(seconds for route, seconds, _, _ in results if route == 'chat')
+    errors = sum(1 for _, _, ok, _ in results if not ok)
+    tiers = {}
+    for route, _, ok, tier in results:
+        if route == 'chat' and ok:
+            tiers[tier] = tiers.get(tier, 0) + 1
+    return {
+        'concurrency': concurrency,
+        'requests': len(results),
+        'chats': len(chats),
+        'clears': len(results) - len(chats),
+        'throughput': round(len(results) / elapsed, 2),
+        'p50_ms': round(percentile(chats, 0.50) * 1000, 1),
+        'p95_ms': round(percentile(chats, 0.95) * 1000, 1),
+        'p99_ms': round(percentile(chats, 0.99) * 1000, 1),
+        'error_rate': round(errors / len(results), 4) if results else 0.0,
+        'rss_mb': round((rss_bytes(pid) or 0) / (1024 * 1024), 1),
+        'peak_rss_mb': round(peak_rss[0] / (1024 * 1024), 1),
+        'tiers': tiers,
+    }
+
+
+def find_knee(levels):
+    """The last concurrency level that still raised throughput by at least 10%"""
+    knee = levels[0]
+    for previous, level in zip(levels, levels[1:]):
+        if level['throughput'] < previous['throughput'] * 1.1:
+            break
+        knee = level
+    return knee
+
+
+def main():
+    if sys.argv[1:2] == ['serve']:
+        serve(sys.argv[2:])
+        return 0
+
+    parser = argparse.ArgumentParser(description="Concurrent load test for the FIFI web app with local stubs")
+    parser.add_argument('--levels', default='1,4,16,64', help="comma-separated concurrency levels")
+    parser.add_argument('--duration', type=float, default=15, help="seconds per level")
+    parser.add_argument('--app', choices=['flask', 'async'], default='flask')
+    parser.add_argument('--pages', help="directory of saved pages (<host>/<path>)")
+    parser.add_argument('--urls', default=os.path.join(ROOT, 'iu_southbend_urls.txt'))
+    parser.add_argument('--questions', default=GOLDEN_FILE, help="golden_queries.json-style question file")
+    parser.add_argument('--sessions', type=int, default=500, help="distinct session ids")
+    parser.add_argument('--clear-ratio', type=float, default=0.05, help="fraction of requests sent to /clear")
+    parser.add_argument('--model-latency', type=float, default=0.3, help="seconds before the first token")
+    parser.add_argument('--tokens', type=int, default=80, help="tokens per model answer")
+    parser.add_argument('--token-delay', type=float, default=0.01, help="seconds between tokens")
+    parser.add_argument('--stream', action='store_true', help="use /chat/stream instead of /chat")
+    parser.add_argument('--cold', action='store_true', help="no answer cache, revalidate every page")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help="write the report to this file")
+    args = parser.parse_args()
+
+    real_urls = read_urls(args.urls)
+    with open(args.questions, 'r', encoding='utf-8') as f:
+        questions = [item['query'] for item in json.load(f)['queries']]
+    levels = [int(level) for level in args.levels.split(',')]
+
+    with tempfile.TemporaryDirectory(prefix='fifi-load-') as scratch:
+        pages_dir = args.pages
+        if pages_dir is None:
+            pages_dir = os.path.join(scratch, 'pages')
+            write_synthetic_pages(real_urls, pages_dir)
+        page_server = start_page_server(pages_dir)
+        model_server = start_stub_openai(args.model_latency, args.tokens, args.token_delay)
+
+        # The app sees the same URLs, rewritten to point at the local page server
+        page_base = f"http://127.0.0.1:{page_server.server_address[1]}/"
+        urls_file = os.path.join(scratch, 'urls.txt')
+        with open(urls_file, 'w', encoding='utf-8') as f:
+            f.writelines(page_base + page_path(url) + '\n' for url in real_urls)
+
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        env = dict(os.environ, OPENAI_BASE_URL=f"http://127.0.0.1:{model_server.server_address[1]}/v1")
+        command = [sys.executable, os.path.abspath(__file__), 'serve', '--port', str(port),
+                   '--urls', urls_file, '--state', scratch, '--app', args.app]
+        if args.cold:
+            command.append('--cold')
+        process = subprocess.Popen(command, cwd=ROOT, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_up(base_url, process)
+            print("FIFI Load Test")
+            print("=" * 90)
+            print(f"{args.app} app, {len(real_urls)} pages, {len(questions)} questions, {args.sessions} sessions, "
+                  f"model {args.model_latency}s + {args.tokens} x {args.token_delay}s"
+                  f"{', streaming' if args.stream else ''}{', cold caches' if args.cold else ''}")
+            print(f"\n{'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+                  f"{'errors':>7} {'RSS MB':>7} {'peak MB':>8}  tiers")
+            print("-" * 90)
+            results = []
+            for concurrency in levels:
+                level = run_level(base_url, process.pid, concurrency, args.duration, args, questions)
+                results.append(level)
+                tiers = ' '.join(f"{tier}={count}" for tier, count in sorted(level['tiers'].items()))
+                print(f"{concurrency:>7} {level['throughput']:>8.1f} {level['p50_ms']:>8.1f} {level['p95_ms']:>8.1f} "
+                      f"{level['p99_ms']:>8.1f} {level['error_rate']:>7.1%} {level['rss_mb']:>7.1f} "
+                      f"{level['peak_rss_mb']:>8.1f}  {tiers}")
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+            page_server.shutdown()
+            model_server.shutdown()
+
+    knee = find_knee(results)
+    if knee is results[-1]:
+        print(f"\nThroughput still scaling at {knee['concurrency']} concurrent clients; try higher --levels")
+    else:
+        print(f"\nThroughput stops scaling after {knee['concurrency']} concurrent clients "
+              f"({knee['throughput']:.1f} req/s, p95 {knee['p95_ms']:.0f} ms)")
+
+    if args.json:
+        report = {'benchmark': 'load', 'settings': {k: v for k, v in vars(args).items() if k != 'json'},
+                  'levels': results, 'knee': knee['concurrency']}
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Report written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""
+FIFI Corpus Snapshot - Offline copy of the extracted text of every knowledge base URL
+Build it with `python corpus.py` and the web app will read page text from a
+memory-mapped view of the snapshot instead of fetching pages over the network.
+
+File layout (little-endian):
+    header  magic b'FIFICORP', format version, entry count, build timestamp
+    index   one (url offset, url length, text offset, text length) record per page
+    data    UTF-8 encoded URLs and page texts
+"""
+
+import mmap
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+CORPUS_MAGIC = b'FIFICORP'
+CORPUS_VERSION = 1
+
+HEADER = struct.Struct('<8sIId')
+ENTRY = struct.Struct('<QIQI')
+
+
+class CorpusError(Exception):
+    """Raised when a corpus file is missing, corrupt or from another format version"""
+
+
+class Corpus:
+    """Read-only, memory-mapped view of a corpus snapshot file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise CorpusError(f"Corpus file is empty: {path}")
+
+        if len(self._mm) < HEADER.size:
+            self.close()
+            raise CorpusError(f"Corpus file is truncated: {path}")
+        magic, version, count, built_at = HEADER.unpack_from(self._mm, 0)
+        if magic != CORPUS_MAGIC:
+            self.close()
+            raise CorpusError(f"Not a FIFI corpus file: {path}")
+        if version != CORPUS_VERSION:
+            self.close()
+            raise CorpusError(f"Unsupported corpus version {version} (expected {CORPUS_VERSION}): {path}")
+
+        self.version = version
+        self.built_at = built_at
+        self._entries = [ENTRY.unpack_from(self._mm, HEADER.size + i * ENTRY.size) for i in range(count)]
+        self._urls = [self._mm[offset:offset + length].decode('utf-8')
+                      for offset, length, _, _ in self._entries]
+        self._lookup = {url: i for i, url in enumerate(self._urls)}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, url):
+        return url in self._lookup
+
+    def text_at(self, i):
+        """Return the page text of the i-th entry"""
+        _, _, offset, length = self._entries[i]
+        return self._mm[offset:offset + length].decode('utf-8')
+
+    def get(self, url):
+        """Return the stored page text for a URL, or None if it is not in the snapshot"""
+        i = self._lookup.get(url)
+        if i is None:
+            return None
+        return self.text_at(i)
+
+    def items(self):
+        """Yield (url, text) pairs for every page in the snapshot"""
+        for i, url in enumerate(self._urls):
+            yield url, self.text_at(i)
+
+    def close(self):
+        """Unmap the snapshot and close the underlying file"""
+        if getattr(self, '_mm', None) is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+
+def open_corpus(path):
+    """Open a corpus snapshot if one has been built, otherwise return None"""
+    if not os.path.exists(path):
+        return None
+    try:
+        return Corpus(path)
+    except CorpusError as e:
+        print(f"Ignoring corpus snapshot: {e}")
+        return None
+
+
+def write_corpus(pages, path):
+    """Write (url, text) pairs to a corpus file, replacing any previous snapshot atomically"""
+    encoded = [(url.encode('utf-8'), text.encode('utf-8')) for url, text in pages]
+
+    offset = HEADER.size + ENTRY.size * len(encoded)
+    index = []
+    for url_bytes, text_bytes in encoded:
+        url_offset = offset
+        text_offset = url_offset + len(url_bytes)
+        offset = text_offset + len(text_bytes)
+        index.append(ENTRY.pack(url_offset, len(url_bytes), text_offset, len(text_bytes)))
+
+    # Write next to the target and rename so running workers keep their old mapping valid
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(CORPUS_MAGIC, CORPUS_VERSION, len(encoded), time.time()))
+        f.writelines(index)
+        for url_bytes, text_bytes in encoded:
+            f.write(url_bytes)
+            f.write(text_bytes)
+    os.replace(tmp_path, path)
+
+
+def download_page_text(url, timeout=15):
+    """Download a page and return its extracted text, or None on failure"""
+    from api_config import EXTRACT_MAX_BYTES
+    from html_extract import extract_response_text
+    from http_pool import get_session
+
+    try:
+        with get_session().get(url, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            return extract_response_text(response, max_bytes=EXTRACT_MAX_BYTES)
+    except Exception as e:
+        print(f"Error fetching {url}: {e}")
+        return None
+
+
+def build_corpus(urls, path, workers=8, reuse=None):
+    """Fetch and extract every URL and write the results to a corpus snapshot.
+
+    reuse maps URLs known to be unchanged to their previously extracted text;
+    those pages are copied instead of downloaded again.
+    """
+    reuse = reuse or {}
+    to_fetch = [url for url in urls if url not in reuse]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        fetched = dict(zip(to_fetch, pool.map(download_page_text, to_fetch)))
+
+    pages = [(url, reuse[url] if url in reuse else fetched[url]) for url in urls]
+    pages = [(url, text) for url, text in pages if text]
+    write_corpus(pages, path)
+    return len(pages)
+
+
+def unchanged_pages(corpus, state, urls):
+    """Texts from an existing snapshot for URLs the crawl state has not seen change since it was built"""
+    reuse = {}
+    for url in urls:
+        record = state.get(url)
+        if record is not None and record.last_changed <= corpus.built_at and url in corpus:
+            reuse[url] = corpus.get(url)
+    return reuse
+
+
+def main():
+    from api_config import CORPUS_PATH, CRAWL_STATE_PATH
+
+    urls_file = sys.argv[1] if len(sys.argv) > 1 else "iu_southbend_urls.txt"
+    output_file = sys.argv[2] if len(sys.argv) > 2 else CORPUS_PATH
+
+    urls = []
+    with open(urls_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                urls.append(line)
+
+    print("FIFI Corpus Builder")
+    print("=" * 50)
+    print(f"Fetching {len(urls)} URLs from {urls_file}...")
+
+    # After a re-crawl, only pages that changed since the last snapshot are downloaded
+    reuse = {}
+    previous = open_corpus(output_file)
+    if previous is not None:
+        if os.path.exists(CRAWL_STATE_PATH):
+            from crawl_state import CrawlState
+
+            reuse = unchanged_pages(previous, CrawlState(CRAWL_STATE_PATH), urls)
+            print(f"Reusing {len(reuse)} unchanged pages from the previous snapshot")
+        previous.close()
+
+    start = time.time()
+    count = build_corpus(urls, output_file, reuse=reuse)
+
+    size_kb = os.path.getsize(output_file) / 1024
+    print(f"\nSaved {count} of {len(urls)} pages to {output_file} ({size_kb:.0f} KB, format v{CORPUS_VERSION})")
+    print(f"Done in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+FIFI Crawl State - What the crawler saw on its last visit to every URL
+Stores per-URL validators (ETag, Last-Modified), a hash of the page body, the
+outgoing links and when the page was last seen and last changed, so a re-crawl
+can send conditional requests and skip pages that have not changed.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+CrawlRecord = namedtuple('CrawlRecord', ['url', 'etag', 'last_modified', 'content_hash',
+                                         'links', 'last_seen', 'last_changed'])
+
+
+def content_hash(body):
+    """Fingerprint a page body so unchanged pages can be recognized without validators"""
+    return hashlib.sha1(body).hexdigest()
+
+
+class CrawlState:
+    """SQLite-backed record of every crawled URL"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS crawl (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                links TEXT NOT NULL,
+                last_seen REAL NOT NULL,
+                last_changed REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM crawl').fetchone()[0]
+
+    def get(self, url):
+        """Return the record for a URL, or None if it has never been crawled"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT url, etag, last_modified, content_hash, links, last_seen, last_changed '
+                'FROM crawl WHERE url = ?', (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return CrawlRecord(*row[:4], json.loads(row[4]), *row[5:])
+
+    def validators(self, record):
+        """Build conditional request headers from a previous visit"""
+        headers = {}
+        if record.etag:
+            headers['If-None-Match'] = record.etag
+        if record.last_modified:
+            headers['If-Modified-Since'] = record.last_modified
+        return headers
+
+    def record(self, url, links, body_hash, etag=None, last_modified=None):
+        """Save a fetched page; returns True if its content changed since the last visit"""
+        now = time.time()
+        previous = self.get(url)
+        changed = previous is None or previous.content_hash != body_hash
+        last_changed = now if changed else previous.last_changed
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO crawl VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, etag, last_modified, body_hash, json.dumps(links), now, last_changed)
+            )
+            self._conn.commit()
+        return changed
+
+    def mark_seen(self, url):
+        """Note that a page was confirmed unchanged (304 Not Modified or up to date in the sitemap)"""
+        with self._lock:
+            self._conn.execute('UPDATE crawl SET last_seen = ? WHERE url = ?', (time.time(), url))
+            self._conn.commit()
@@ -0,0 +1,796 @@
+"""
+FIFI Engine - Question answering core shared by the web apps and the command line
+Retrieval, caches, prompt assembly and model calls live here; app.py,
+async_app.py and fifi_chatbot.py are thin front ends over it. Everything that
+is slow to set up (the OpenAI client and its import, the API key, the corpus
+snapshot and its indexes, the prompt token counter, the SQLite stores) is
+built on first use, so importing the engine is cheap and each forked worker
+opens its own database connections.
+"""
+
+import functools
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Import API configuration (the API key is read from api_config on first use)
+import api_config
+from api_config import MODEL_NAME, MAX_TOKENS, TEMPERATURE
+from api_config import PAGE_CACHE_PATH, PAGE_CACHE_TTL, PAGE_CACHE_MAX_BYTES, PAGE_CACHE_TOUCH_INTERVAL
+from api_config import FETCH_WORKERS, CONTEXT_DEADLINE, CORPUS_PATH, SEARCH_INDEX_PATH
+from api_config import PAGE_TEXT_LIMIT, PASSAGE_CHARS, PASSAGE_OVERLAP, PASSAGE_CANDIDATES, CONTEXT_CHAR_BUDGET
+from api_config import EXTRACT_MAX_BYTES
+from api_config import RETRIEVAL_MODE, VECTOR_INDEX_PATH, VECTOR_DIM
+from api_config import ANSWER_CACHE_TTL, ANSWER_CACHE_MAX_ENTRIES
+from api_config import ANSWER_MODE, STATIC_DIRECT_CONFIDENCE, STATIC_CONTEXT_CONFIDENCE
+from api_config import PROMPT_TOKEN_BUDGET, HISTORY_TOKEN_BUDGET, SUMMARY_TOKEN_BUDGET, HISTORY_RECENT_MESSAGES
+from api_config import MODEL_CONTEXT_WINDOW
+from api_config import PREFETCH_ENABLED, PREFETCH_HOT_URLS, PREFETCH_INTERVAL, PREFETCH_REFRESH_AHEAD
+from api_config import PREFETCH_WORKERS, PREFETCH_JITTER, PREFETCH_DECAY
+from api_config import BATCH_MAX_QUESTIONS, BATCH_RETRIEVAL_WORKERS, BATCH_MODEL_CONCURRENCY, BATCH_FETCH_WORKERS
+from api_config import SESSION_BACKEND, SESSION_DB_PATH, SESSION_IDLE_TIMEOUT, SESSION_MAX_SESSIONS, SESSION_MAX_BYTES
+from api_config import SESSION_TOUCH_INTERVAL
+
+# Import persistent page cache and offline corpus snapshot
+from page_cache import PageCache
+from corpus import open_corpus
+from html_extract import extract_response_text
+from http_pool import get_session, openai_client_options
+from search_index import SearchIndex, load_or_build_index
+from passages import Passage, split_passages, pack_passages
+from answer_cache import AnswerCache, is_self_contained, normalize_query
+from session_store import open_session_store
+from prompt_builder import PromptBuilder, compact_history
+from singleflight import SingleFlight
+from prefetch import Prefetcher
+from metrics import MetricsRegistry
+from query_router import QueryRouter
+
+# Import static knowledge base
+from knowledge_base import match_static_answer, render_static_answer
+
+logger = logging.getLogger('fifi')
+
+
+def lazy(build):
+    """Decorator for a zero-argument builder: build the shared value on the first call, then reuse it.
+
+    The returned getter also has loaded() and set(value), e.g. to override the value in a benchmark.
+    """
+    lock = threading.Lock()
+    value = []
+
+    @functools.wraps(build)
+    def get():
+        if not value:
+            with lock:
+                if not value:
+                    value.append(build())
+        return value[0]
+
+    def set_value(new_value):
+        with lock:
+            value[:] = [new_value]
+
+    get.loaded = lambda: bool(value)
+    get.set = set_value
+    return get
+
+
+@lazy
+def get_client():
+    """The OpenAI client; importing openai and reading api_key.txt wait until the first model call"""
+    from openai import OpenAI
+    return OpenAI(api_key=api_config.OPENAI_API_KEY, **openai_client_options())
+
+
+@lazy
+def get_page_cache():
+    """Extracted page text shared across requests and restarts"""
+    return PageCache(PAGE_CACHE_PATH, ttl=PAGE_CACHE_TTL, max_bytes=PAGE_CACHE_MAX_BYTES,
+                     touch_interval=PAGE_CACHE_TOUCH_INTERVAL)
+
+
+@lazy
+def get_corpus():
+    """Memory-mapped corpus snapshot (None until `python corpus.py` has been run)"""
+    return open_corpus(CORPUS_PATH)
+
+
+@lazy
+def get_search_index():
+    """BM25 index over the snapshot's page text (None without a snapshot)"""
+    return load_or_build_index(get_corpus(), SEARCH_INDEX_PATH, PASSAGE_CHARS, PASSAGE_OVERLAP)
+
+
+@lazy
+def get_vector_index():
+    """Dense vectors for the same passages (None in lexical mode, without a snapshot or without NumPy)"""
+    if RETRIEVAL_MODE == 'lexical' or get_search_index() is None:
+        return None
+    # NumPy is only imported once there is a snapshot to search
+    from vector_index import load_or_build_vector_index
+    return load_or_build_vector_index(get_search_index(), get_corpus(), VECTOR_INDEX_PATH, VECTOR_DIM)
+
+
+# Answers to repeated questions, keyed on the question and its context
+answer_cache = AnswerCache(ttl=ANSWER_CACHE_TTL, max_entries=ANSWER_CACHE_MAX_ENTRIES)
+
+# Bounded pool shared by all requests for fetching context pages
+fetch_pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix='fifi-fetch')
+
+# Collapse concurrent identical page downloads and model calls into one
+page_fetches = SingleFlight()
+question_flights = SingleFlight()
+stream_flights = SingleFlight()
+
+# The flights counted by coalescing_stats; async_app adds its asyncio flights to the same groups
+coalescing_groups = {'page_fetches': [page_fetches], 'questions': [question_flights], 'streams': [stream_flights]}
+
+
+@lazy
+def get_session_store():
+    """Conversation histories with idle expiry and LRU caps (sqlite backend is shared by workers)"""
+    return open_session_store(
+        SESSION_BACKEND,
+        path=SESSION_DB_PATH,
+        idle_timeout=SESSION_IDLE_TIMEOUT,
+        max_sessions=SESSION_MAX_SESSIONS,
+        max_bytes=SESSION_MAX_BYTES,
+        touch_interval=SESSION_TOUCH_INTERVAL
+    )
+
+
+# Stage latencies and hot-path counters, exposed at /metrics
+metrics = MetricsRegistry()
+stage_seconds = metrics.histogram('fifi_stage_seconds', 'Time spent in each stage of answering a question', ['stage'])
+request_seconds = metrics.histogram('fifi_request_seconds', 'Time to handle a chat request', ['route'])
+responses_total = metrics.counter('fifi_responses_total', 'Answers sent, by the tier that produced them', ['tier'])
+static_lookups_total = metrics.counter('fifi_static_lookups_total', 'Static knowledge base lookups', ['result'])
+page_downloads_total = metrics.counter('fifi_page_downloads_total', 'Live page downloads', ['result'])
+dropped_sources_total = metrics.counter('fifi_dropped_sources_total', 'Context pages dropped for missing the deadline')
+model_tokens_total = metrics.counter('fifi_model_tokens_total', 'Tokens sent to and received from the model', ['kind'])
+model_errors_total = metrics.counter('fifi_model_errors_total', 'Failed model calls')
+
+
+def load_urls(filepath="iu_southbend_urls.txt"):
+    """Load scraped URLs from file"""
+    urls = []
+    if os.path.exists(filepath):
+        with open(filepath, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    urls.append(line)
+    return urls
+
+
+@lazy
+def get_urls():
+    """The URL list from iu_southbend_urls.txt"""
+    return load_urls()
+
+
+def fetch_page_content(url, timeout=10):
+    """Fetch and extract text content from a URL, using the page cache when possible"""
+    corpus = get_corpus()
+    if corpus is not None:
+        text = corpus.get(url)
+        return text[:PAGE_TEXT_LIMIT] if text else None
+
+    # Concurrent requests for the same page share one download
+    return page_fetches.do(url, load_page_content, url, timeout)
+
+
+def load_page_content(url, timeout=10):
+    """Return a page's text from the page cache, revalidating or downloading it as needed"""
+    page_cache = get_page_cache()
+    cached = page_cache.get(url)
+    if cached and page_cache.is_fresh(cached):
+        return cached.text
+    return download_page_content(url, cached, timeout)
+
+
+def refresh_page_content(url, timeout=10):
+    """Revalidate or re-download a page into the page cache, even if it is still fresh"""
+    return page_fetches.do(url, download_page_content, url, get_page_cache().peek(url), timeout)
+
+
+def download_page_content(url, cached=None, timeout=10):
+    """Download a page (conditionally when a cached copy exists) and store its text in the page cache"""
+    page_cache = get_page_cache()
+    with stage_seconds.time('download'):
+        try:
+            headers = page_cache.validators(cached) if cached else {}
+            with get_session().get(url, headers=headers, timeout=timeout, stream=True) as response:
+                if cached and response.status_code == 304:
+                    return page_not_modified(url, cached)
+
+                response.raise_for_status()
+
+                # Parses while downloading and stops once PAGE_TEXT_LIMIT characters are extracted
+                text = extract_response_text(response, PAGE_TEXT_LIMIT, EXTRACT_MAX_BYTES)
+            return store_page(url, text, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        except Exception:
+            return page_download_failed(cached)
+
+
+def page_not_modified(url, cached):
+    """Mark a cached page fresh again after a 304 Not Modified response and return its text"""
+    get_page_cache().touch(url)
+    page_downloads_total.inc('not_modified')
+    return cached.text
+
+
+def store_page(url, text, etag=None, last_modified=None):
+    """Store a downloaded page's text in the page cache and return it"""
+    get_page_cache().put(url, text, etag, last_modified)
+    page_downloads_total.inc('ok')
+    return text
+
+
+def page_download_failed(cached):
+    """Count a failed download and fall back to the stale cached text, if any"""
+    page_downloads_total.inc('error')
+    return cached.text if cached else None
+
+
+# Map query keywords to URL patterns
+KEYWORD_PATTERNS = {
+    'admission': ['admission', 'apply', 'enroll'],
+    'tuition': ['tuition', 'cost', 'fee', 'bursar', 'financial'],
+    'financial': ['financial', 'aid', 'scholarship', 'bursar'],
+    'program': ['program', 'academic', 'degree', 'major'],
+    'course': ['course', 'class', 'schedule', 'registrar'],
+    'housing': ['housing', 'residence', 'dorm'],
+    'parking': ['parking', 'transportation'],
+    'library': ['library', 'libguide', 'libguides', 'circulation', 'reserves', 'reserve', 'book', 'borrow', 'checkout', 'printing', 'print', '3d', 'werc', 'policy', 'librarian', 'research', 'hours', 'schurz', 'subject-librarian', 'research-support', 'wideformat', 'room', 'study', 'room-reservation'],
+    'career': ['career', 'job', 'internship', 'handshake'],
+    'transfer': ['transfer'],
+    'graduate': ['graduate', 'grad', 'master'],
+    'international': ['international', 'oiss', 'visa'],
+    'calendar': ['calendar', 'schedule', 'date'],
+    'contact': ['contact', 'phone', 'email'],
+    'visit': ['visit', 'tour', 'campus'],
+    'student': ['student', 'service'],
+    'orientation': ['orientation', 'new-student'],
+    'faculty': ['faculty', 'professor', 'staff', 'directory', 'people', 'dr', 'doctor'],
+    'computer': ['computer', 'computer-science', 'computer-science-informatics', 'cs', 'computing', 'informatics', 'clas'],
+    'math': ['math', 'mathematics', 'applied'],
+    'business': ['business', 'mba', 'accounting', 'management'],
+    'nursing': ['nursing', 'health', 'nurse'],
+    'education': ['education', 'teaching', 'teacher'],
+    'arts': ['arts', 'music', 'theatre', 'art', 'performance'],
+}
+
+# Faculty/people pages get a boost in URL keyword scoring
+URL_BOOST_TERMS = ('faculty', 'people', 'staff')
+
+url_router = None
+
+
+def get_url_router(urls):
+    """Return the compiled URL keyword router for a URL list, building it on first use"""
+    global url_router
+    if url_router is None or url_router.urls is not urls:
+        url_router = QueryRouter(KEYWORD_PATTERNS, urls, boost_terms=URL_BOOST_TERMS)
+    return url_router
+
+
+def retrieval_indexes():
+    """Return the snapshot indexes selected by RETRIEVAL_MODE"""
+    search_index = get_search_index()
+    if search_index is None:
+        return []
+    vector_index = get_vector_index()
+    if vector_index is None:
+        return [search_index]
+    if RETRIEVAL_MODE == 'dense':
+        return [vector_index]
+    return [search_index, vector_index]
+
+
+def warm_up():
+    """Load the URL list, the corpus snapshot and its indexes now rather than on the first question"""
+    get_url_router(get_urls())
+    retrieval_indexes()
+
+
+def search_pages(query, k=8):
+    """Rank snapshot pages for a query, fusing lexical and dense rankings in hybrid mode"""
+    from vector_index import fuse_rankings
+    rankings = [[url for url, _ in index.search(query, k)] for index in retrieval_indexes()]
+    return [url for url, _ in fuse_rankings(rankings)[:k]]
+
+
+def search_passages(query, k):
+    """Rank snapshot passages for a query, fusing lexical and dense rankings in hybrid mode"""
+    from vector_index import fuse_rankings
+    hits_by_key = {}
+    rankings = []
+    for index in retrieval_indexes():
+        hits = index.search_passages(query, k)
+        rankings.append([(hit.url, hit.start) for hit in hits])
+        for hit in hits:
+            hits_by_key.setdefault((hit.url, hit.start), hit)
+    return [hits_by_key[key]._replace(score=score) for key, score in fuse_rankings(rankings)[:k]]
+
+
+def find_relevant_urls(urls, query):
+    """Find URLs that might be relevant to the query"""
+    with stage_seconds.time('route'):
+        return rank_relevant_urls(urls, query)
+
+
+def rank_relevant_urls(urls, query):
+    """Rank URLs by the snapshot indexes, falling back to URL keywords"""
+    if get_search_index() is not None:
+        results = search_pages(query, k=8)
+        if results:
+            return results
+
+    # No indexed page text (or no indexed term matched) - score by URL keywords
+    return get_url_router(urls).route(query, limit=8)
+
+
+def passage_context(hits, page_text):
+    """Pack the best-scoring passages into the context budget"""
+    passages = [hit._replace(text=page_text(hit.url)[hit.start:hit.end]) for hit in hits]
+    return pack_passages(passages, CONTEXT_CHAR_BUDGET)
+
+
+def get_context_from_urls(urls, query, deadline=CONTEXT_DEADLINE, pool=None):
+    """Build prompt context from the passages most relevant to the query.
+
+    With a corpus snapshot, passages come straight from the snapshot indexes.
+    Otherwise the relevant pages are fetched concurrently, whatever arrives
+    before the deadline is split into passages and the best ones are kept;
+    slow pages keep downloading in the background so they land in the page cache.
+    Pages are fetched on `pool`, the shared fetch_pool unless given.
+    Returns the context text and the list of source URLs it draws from.
+    """
+    context, sources, to_fetch = local_context(urls, query)
+    if not to_fetch:
+        return context, sources
+
+    with stage_seconds.time('fetch'):
+        futures = [(url, (pool or fetch_pool).submit(fetch_page_content, url)) for url in to_fetch]
+        done, _ = wait([future for _, future in futures], timeout=deadline)
+    pages = []
+    for url, future in futures:
+        if future in done:
+            pages.append((url, future.result()))
+        else:
+            drop_slow_source(url, deadline)
+
+    return context_from_pages(query, pages)
+
+
+def local_context(urls, query):
+    """Everything get_context_from_urls does that needs no page downloads.
+
+    Returns (context, sources, []) when the corpus snapshot covers the query, or
+    (None, None, urls) with the relevant pages that have to be fetched first.
+    """
+    corpus = get_corpus()
+    if get_search_index() is not None:
+        with stage_seconds.time('search'):
+            hits = search_passages(query, PASSAGE_CANDIDATES)
+            context, sources = passage_context(hits, corpus.get)
+        if sources:
+            return context, sources, []
+
+    relevant_urls = find_relevant_urls(urls, query)[:3]
+    if corpus is None and relevant_urls:
+        get_prefetcher().record(relevant_urls)
+        return None, None, relevant_urls
+
+    # Snapshot reads never touch the network, so they skip the fetch pool and deadline
+    context, sources = context_from_pages(query, [(url, fetch_page_content(url)) for url in relevant_urls])
+    return context, sources, []
+
+
+def drop_slow_source(url, deadline):
+    """Count and log a context page left out because it missed the deadline"""
+    dropped_sources_total.inc()
+    logger.info("Dropped slow source after %.1fs deadline: %s", deadline, url)
+
+
+def context_from_pages(query, pages):
+    """Split fetched (url, text) pages into passages and pack the best ones for the query"""
+    with stage_seconds.time('passages'):
+        return pages_to_context(query, pages)
+
+
+def pages_to_context(query, pages):
+    """Passage ranking and packing behind context_from_pages"""
+    page_texts = {url: content for url, content in pages if content}
+    index = SearchIndex.build(page_texts.items(), PASSAGE_CHARS, PASSAGE_OVERLAP)
+    hits = index.search_passages(query, k=PASSAGE_CANDIDATES)
+    context, sources = passage_context(hits, page_texts.get)
+    if not sources:
+        # Nothing in the pages matched the query terms - use the start of each page
+        leads = []
+        for url, text in page_texts.items():
+            start, end = split_passages(text, PASSAGE_CHARS, PASSAGE_OVERLAP)[0]
+            leads.append(Passage(url, start, end, text[start:end], 0.0))
+        context, sources = pack_passages(leads, CONTEXT_CHAR_BUDGET)
+    return context, sources
+
+
+def question_key(query, context):
+    """Key under which identical questions with identical context are coalesced"""
+    return normalize_query(query), context
+
+
+@lazy
+def get_prefetcher():
+    """Background refresh of the pages questions need most often"""
+    return Prefetcher(
+        refresh_page_content,
+        get_page_cache(),
+        hot_size=PREFETCH_HOT_URLS,
+        interval=PREFETCH_INTERVAL,
+        refresh_ahead=PREFETCH_REFRESH_AHEAD,
+        workers=PREFETCH_WORKERS,
+        jitter=PREFETCH_JITTER,
+        decay=PREFETCH_DECAY
+    )
+
+
+@lazy
+def start_prefetcher():
+    """Warm the page cache with recently used pages and keep the hot set fresh in the background.
+
+    Runs once per process, so the web apps call it from every request and each
+    server worker (e.g. under gunicorn) starts its own refresh thread after forking.
+    Returns whether the prefetcher was started.
+    """
+    if PREFETCH_ENABLED and get_corpus() is None:
+        get_prefetcher().start(get_page_cache().recent_urls(PREFETCH_HOT_URLS))
+        return True
+    return False
+
+
+def coalescing_stats():
+    """Counters for calls collapsed into an identical call already in flight, summed per group"""
+    stats = {}
+    for group, flights in coalescing_groups.items():
+        totals = stats[group] = {}
+        for flight in flights:
+            for key, value in flight.stats().items():
+                totals[key] = totals.get(key, 0) + value
+    return stats
+
+
+def lookup_static(query):
+    """match_static_answer, timed and counted for /metrics"""
+    with stage_seconds.time('static'):
+        match = match_static_answer(query)
+    static_lookups_total.inc('hit' if match else 'miss')
+    return match
+
+
+def record_usage(usage):
+    """Count the prompt and completion tokens reported for a model call"""
+    if usage is not None:
+        model_tokens_total.inc('prompt', amount=usage.prompt_tokens or 0)
+        model_tokens_total.inc('completion', amount=usage.completion_tokens or 0)
+
+
+def direct_answer(query, conversation_history):
+    """Return a static answer confident enough to send without calling the model, or None"""
+    if ANSWER_MODE != 'tiered' or not is_self_contained(query, conversation_history):
+        return None
+    match = lookup_static(query)
+    if match is None or match.confidence < STATIC_DIRECT_CONFIDENCE:
+        return None
+    return render_static_answer(match)
+
+
+def retrieve_context(query, urls, pool=None):
+    """Get the context for a question: verified static knowledge first, then web pages.
+
+    Returns the context text, the list of source URLs it draws from and the
+    tier that will answer it ("llm-static" or "llm-retrieval").
+    """
+    # First, check static knowledge base for instant answers
+    static = static_context(query)
+    if static is not None:
+        return static
+
+    # Fall back to fetching from URLs
+    context, sources = get_context_from_urls(urls, query, pool=pool)
+    return context, sources, 'llm-retrieval'
+
+
+def static_context(query):
+    """The static knowledge answer as prompt context (context, sources, tier), or None if it isn't confident enough"""
+    match = lookup_static(query)
+    if match and match.confidence >= STATIC_CONTEXT_CONFIDENCE:
+        # Use static knowledge as primary context
+        return f"VERIFIED INFORMATION:\n{match.answer}", [], 'llm-static'
+    return None
+
+
+SYSTEM_MESSAGE = """You are FIFI, a friendly and helpful chatbot assistant for IU South Bend (Indiana University South Bend).
+Your purpose is to help students, prospective students, and visitors find information about IU South Bend.
+
+Guidelines:
+- Be friendly, helpful, and professional
+- Use the provided context from IU South Bend web pages to answer questions
+- If you don't have specific information, suggest relevant resources or direct users to contact the appropriate office
+- Always mention relevant URLs from the context when applicable
+- If a question is not related to IU South Bend, politely redirect to IU South Bend topics
+- Keep responses concise but informative
+- Format your responses nicely with line breaks where appropriate"""
+
+
+@lazy
+def get_prompt_builder():
+    """Splits the input token budget between the system prompt, history and context"""
+    return PromptBuilder(
+        SYSTEM_MESSAGE,
+        model=MODEL_NAME,
+        budget=PROMPT_TOKEN_BUDGET,
+        history_budget=HISTORY_TOKEN_BUDGET,
+        max_completion=MAX_TOKENS,
+        context_window=MODEL_CONTEXT_WINDOW
+    )
+
+
+def build_messages(query, context, conversation_history):
+    """Build the OpenAI message list for a question, its context and recent history.
+
+    Returns the messages and the completion token limit that still fits the model.
+    """
+    with stage_seconds.time('prompt'):
+        return get_prompt_builder().build(query, context, conversation_history)
+
+
+def chat_with_fifi(query, urls, conversation_history):
+    """Send query to OpenAI with context from IU South Bend URLs.
+
+    Returns the response text, the list of source URLs used as context and the
+    tier that produced the answer: "static" (knowledge base, no model call),
+    "cache", "llm-static" or "llm-retrieval".
+    """
+    answer, complete, sources, tier = prepare_answer(query, urls, conversation_history)
+    if complete is not None:
+        answer = complete()
+    return answer, sources, tier
+
+
+def prepare_answer(query, urls, conversation_history, pool=None):
+    """Do everything chat_with_fifi does up to the model call.
+
+    Returns the answer (None if the model is still needed), a function that
+    calls the model and returns the answer (None if not needed), the source
+    URLs and the tier. Context pages are fetched on `pool` (default: fetch_pool).
+    """
+    answer = direct_answer(query, conversation_history)
+    if answer is not None:
+        return answer, None, [], 'static'
+
+    context, sources, tier = retrieve_context(query, urls, pool)
+
+    answer, request = prepare_prompt(query, context, conversation_history)
+    if request is None:
+        return answer, None, sources, 'cache'
+    return None, functools.partial(complete_answer, request), sources, tier
+
+
+# A model call still to be made. `shared` is set when the prompt carries no
+# conversation history, so the answer may be cached and identical calls coalesced.
+ModelRequest = namedtuple('ModelRequest', ['query', 'context', 'messages', 'max_tokens', 'shared'])
+
+
+def prepare_prompt(query, context, conversation_history):
+    """Answer from the answer cache, or build the model call.
+
+    Returns (cached answer, None) or (None, ModelRequest).
+    """
+    # Questions that lean on earlier turns can't reuse answers given in other conversations
+    if is_self_contained(query, conversation_history):
+        cached_answer = answer_cache.get(query, context)
+        if cached_answer is not None:
+            return cached_answer, None
+    else:
+        answer_cache.bypass()
+
+    messages, max_tokens = build_messages(query, context, conversation_history)
+    return None, ModelRequest(query, context, messages, max_tokens, not conversation_history)
+
+
+def completion_options(request):
+    """Keyword arguments for the chat completion call of a ModelRequest"""
+    return {'model': MODEL_NAME, 'messages': request.messages, 'max_tokens': request.max_tokens,
+            'temperature': TEMPERATURE}
+
+
+def finish_answer(request, answer):
+    """Cache a model answer for later askers of the same question, unless its prompt had history"""
+    # An answer written with this conversation's history in the prompt is not shared
+    if request.shared:
+        answer_cache.put(request.query, request.context, answer)
+    return answer
+
+
+def stream_delta(chunk):
+    """Record a streamed chunk's token usage and return its text (None if it has none)"""
+    # The final chunk has no choices, only the token usage
+    record_usage(getattr(chunk, 'usage', None))
+    if not chunk.choices:
+        return None
+    return chunk.choices[0].delta.content
+
+
+def error_answer(error):
+    """The reply sent when answering a question failed"""
+    return f"I'm sorry, I encountered an error: {str(error)}"
+
+
+def call_model(request):
+    """Ask the model to answer a ModelRequest"""
+    with stage_seconds.time('model'):
+        try:
+            response = get_client().chat.completions.create(**completion_options(request))
+        except Exception:
+            model_errors_total.inc()
+            raise
+    record_usage(response.usage)
+    return finish_answer(request, response.choices[0].message.content)
+
+
+def complete_answer(request):
+    """Call the model for a ModelRequest, returning an apology instead of raising"""
+    try:
+        if not request.shared:
+            return call_model(request)
+        # Identical new-conversation questions asked at the same time share one model call
+        return question_flights.do(question_key(request.query, request.context), call_model, request)
+
+    except Exception as e:
+        return error_answer(e)
+
+
+def batch_error(questions):
+    """Return why a /chat/batch question list can't be answered, or None if it can"""
+    if not isinstance(questions, list) or not questions:
+        return 'Provide "questions" as a non-empty list'
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        return f'At most {BATCH_MAX_QUESTIONS} questions per batch'
+    if not all(isinstance(question, str) and question.strip() for question in questions):
+        return 'Every question must be a non-empty string'
+    return None
+
+
+def batch_groups(questions):
+    """Group the indexes of a batch's questions so questions that are the same after normalization are answered once"""
+    groups = {}
+    for index, question in enumerate(questions):
+        groups.setdefault(normalize_query(question), []).append(index)
+    return list(groups.values())
+
+
+def batch_results(questions, indexes, response, sources, tier, start):
+    """The result dicts for a group of batch questions that share one answer"""
+    seconds = round(time.perf_counter() - start, 3)
+    return [{'index': index, 'question': questions[index], 'response': response,
+             'sources': sources, 'tier': tier, 'seconds': seconds} for index in indexes]
+
+
+def answer_batch(questions, urls, model_concurrency=BATCH_MODEL_CONCURRENCY):
+    """Answer a list of independent questions, yielding each result as soon as it is ready.
+
+    Questions that are the same after normalization are answered once. Context
+    for every question is retrieved in parallel up front, and at most
+    `model_concurrency` model calls run at a time. Context pages are fetched on
+    a pool of BATCH_FETCH_WORKERS threads of the batch's own, so a large batch
+    never queues live chats behind its downloads. Each result is a dict with the
+    question's index and text, the response, its sources and tier, and the
+    seconds from the start of the batch until it was ready.
+    """
+    start = time.perf_counter()
+    groups = batch_groups(questions)
+
+    retrieval_workers = max(1, min(BATCH_RETRIEVAL_WORKERS, len(groups)))
+    retrieval_pool = ThreadPoolExecutor(max_workers=retrieval_workers, thread_name_prefix='fifi-batch')
+    batch_fetch_pool = ThreadPoolExecutor(max_workers=BATCH_FETCH_WORKERS, thread_name_prefix='fifi-batch-fetch')
+    model_pool = ThreadPoolExecutor(max_workers=model_concurrency, thread_name_prefix='fifi-batch-model')
+    pools = (retrieval_pool, batch_fetch_pool, model_pool)
+    try:
+        # future -> (question indexes, sources, tier); sources and tier are None until retrieval is done
+        pending = {retrieval_pool.submit(prepare_answer, questions[indexes[0]], urls, [], batch_fetch_pool):
+                   (indexes, None, None) for indexes in groups}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                indexes, sources, tier = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    yield from batch_results(questions, indexes, error_answer(e), sources or [], tier or 'error', start)
+                    continue
+                if sources is not None:
+                    yield from batch_results(questions, indexes, result, sources, tier, start)
+                    continue
+                answer, complete, sources, tier = result
+                if complete is None:
+                    yield from batch_results(questions, indexes, answer, sources, tier, start)
+                else:
+                    pending[model_pool.submit(complete)] = (indexes, sources, tier)
+    finally:
+        # Don't block on the pools: when the caller stopped reading (e.g. the client
+        # disconnected), queued work is dropped and running calls finish on their own
+        for pool in pools:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def stream_chat_with_fifi(query, urls, conversation_history):
+    """Like chat_with_fifi, but yields the response text in chunks as the model produces them.
+
+    Retrieval happens up front; returns the chunk generator, the list of source
+    URLs and the answering tier.
+    """
+    answer = direct_answer(query, conversation_history)
+    if answer is not None:
+        return iter([answer]), [], 'static'
+
+    context, sources, tier = retrieve_context(query, urls)
+
+    answer, request = prepare_prompt(query, context, conversation_history)
+    if request is None:
+        return iter([answer]), sources, 'cache'
+
+    def generate():
+        parts = []
+        start = time.perf_counter()
+        try:
+            stream = get_client().chat.completions.create(
+                **completion_options(request),
+                stream=True,
+                stream_options={'include_usage': True}
+            )
+            for chunk in stream:
+                delta = stream_delta(chunk)
+                if delta:
+                    if not parts:
+                        stage_seconds.observe(time.perf_counter() - start, 'model_first_token')
+                    parts.append(delta)
+                    yield delta
+        except Exception as e:
+            model_errors_total.inc()
+            yield error_answer(e)
+            return
+        stage_seconds.observe(time.perf_counter() - start, 'model')
+        finish_answer(request, "".join(parts))
+
+    if not request.shared:
+        return generate(), sources, tier
+    return iter(stream_flights.share(question_key(query, context), generate)), sources, tier
+
+
+def compact_session(history):
+    """Fold all but the most recent messages of a history into its rolling summary"""
+    return compact_history(history, HISTORY_RECENT_MESSAGES, SUMMARY_TOKEN_BUDGET, MODEL_NAME)
+
+
+def record_turn(session_id, user_message, response):
+    """Add a question and its answer to a session's conversation history"""
+    # Older turns are kept only as a short summary
+    get_session_store().append(session_id, [
+        {"role": "user", "content": user_message},
+        {"role": "assistant", "content": response},
+    ], compact=compact_session)
+
+
+# Cache, session, coalescing and prefetch counters, read when /metrics is scraped
+metrics.collect('fifi_page_cache', lambda: get_page_cache().stats())
+metrics.collect('fifi_answer_cache', answer_cache.stats)
+metrics.collect('fifi_sessions', lambda: get_session_store().stats())
+metrics.collect('fifi_coalescing', coalescing_stats, label='group')
+metrics.collect('fifi_prefetch', lambda: get_prefetcher().stats())
@@ -0,0 +1,232 @@
+"""
+FIFI HTML Extract - Streaming visible-text extraction from HTML pages
+Text is pulled out while the page is parsed: script, style, nav, footer and
+header elements are skipped on the fly, no document tree is built, and parsing
+stops as soon as enough text has been collected or too many bytes were read.
+Uses lxml's incremental parser when it is installed, otherwise html.parser.
+
+Output matches BeautifulSoup's get_text(separator=' ', strip=True) after
+decomposing the skipped elements.
+"""
+
+import codecs
+import re
+from html.parser import HTMLParser
+
+try:
+    from lxml import etree
+except ImportError:  # lxml is optional
+    etree = None
+
+SKIP_TAGS = frozenset(['script', 'style', 'nav', 'footer', 'header'])
+VOID_TAGS = frozenset(['area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen',
+                       'link', 'menuitem', 'meta', 'param', 'source', 'track', 'wbr'])
+CHUNK_SIZE = 64 * 1024
+
+
+class TextCollector:
+    """Joins the stripped text nodes outside skipped elements, up to a character limit"""
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.parts = []
+        self.length = 0
+        self.done = False
+        self._pending = []
+        self._skip_depth = 0
+
+    def start(self, tag):
+        self.flush()
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+
+    def end(self, tag):
+        self.flush()
+        if tag in SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def data(self, data):
+        if not self._skip_depth and not self.done:
+            self._pending.append(data)
+
+    def flush(self):
+        """End the current text node (text is split into nodes at every tag and comment)"""
+        if not self._pending:
+            return
+        text = ''.join(self._pending).strip()
+        self._pending = []
+        if text:
+            self.parts.append(text)
+            self.length += len(text) + 1
+            if self.limit is not None and self.length > self.limit:
+                self.done = True
+
+    def text(self):
+        self.flush()
+        text = ' '.join(self.parts)
+        return text[:self.limit] if self.limit is not None else text
+
+
+class _StdlibParser(HTMLParser):
+    """html.parser front end feeding a TextCollector"""
+
+    def __init__(self, collector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+        self._open = []  # open elements, so an end tag also closes the unclosed ones inside it
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            self.collector.flush()
+            return
+        self._open.append(tag)
+        self.collector.start(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.collector.flush()
+
+    def handle_endtag(self, tag):
+        if tag not in self._open:
+            self.collector.flush()
+            return
+        while True:
+            closed = self._open.pop()
+            self.collector.end(closed)
+            if closed == tag:
+                break
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+    def handle_comment(self, data):
+        self.collector.flush()
+
+    def handle_decl(self, decl):
+        self.collector.flush()
+
+    def handle_pi(self, data):
+        self.collector.flush()
+
+
+class _LxmlTarget:
+    """lxml parser target feeding a TextCollector"""
+
+    def __init__(self, collector):
+        self.collector = collector
+
+    def start(self, tag, attrib):
+        self.collector.start(tag)
+
+    def end(self, tag):
+        self.collector.end(tag)
+
+    def data(self, data):
+        self.collector.data(data)
+
+    def comment(self, text):
+        self.collector.flush()
+
+    def close(self):
+        pass
+
+
+class StreamingExtractor:
+    """Incremental extractor: feed() decoded HTML chunks, then call text()"""
+
+    def __init__(self, limit=None, backend=None):
+        self.collector = TextCollector(limit)
+        self.backend = backend or ('lxml' if etree is not None else 'html.parser')
+        if self.backend == 'lxml':
+            if etree is None:
+                raise ValueError("The lxml backend needs lxml (pip install lxml)")
+            self._parser = etree.HTMLParser(target=_LxmlTarget(self.collector), recover=True)
+        elif self.backend == 'html.parser':
+            self._parser = _StdlibParser(self.collector)
+        else:
+            raise ValueError(f"Unknown HTML backend: {self.backend!r} (expected 'lxml' or 'html.parser')")
+
+    @property
+    def done(self):
+        """True once the character limit has been reached and the rest of the page can be dropped"""
+        return self.collector.done
+
+    def feed(self, html):
+        if not self.done and html:
+            self._parser.feed(html)
+
+    def text(self):
+        if not self.done:
+            self._parser.close()
+        return self.collector.text()
+
+
+def extract_text(html, limit=None, backend=None):
+    """Extract visible text from an HTML string"""
+    extractor = StreamingExtractor(limit, backend)
+    for i in range(0, len(html), CHUNK_SIZE):
+        extractor.feed(html[i:i + CHUNK_SIZE])
+        if extractor.done:
+            break
+    return extractor.text()
+
+
+def charset_from_content_type(content_type, default='utf-8'):
+    """Pick the text encoding named in a Content-Type header"""
+    match = re.search(r'charset=["\']?([\w.:-]+)', content_type or '', re.IGNORECASE)
+    if match:
+        try:
+            return codecs.lookup(match.group(1)).name
+        except LookupError:
+            pass
+    return default
+
+
+class ByteStreamExtractor:
+    """Incremental extractor for raw byte chunks: decodes them and stops after max_bytes or enough text"""
+
+    def __init__(self, limit=None, max_bytes=None, encoding='utf-8', backend=None):
+        self.max_bytes = max_bytes
+        self.received = 0
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self._extractor = StreamingExtractor(limit, backend)
+
+    @property
+    def done(self):
+        """True once the character limit or the byte cap has been reached"""
+        return self._extractor.done or (self.max_bytes is not None and self.received >= self.max_bytes)
+
+    def feed(self, chunk):
+        if self.done:
+            return
+        if self.max_bytes is not None and self.received + len(chunk) > self.max_bytes:
+            chunk = chunk[:self.max_bytes - self.received]
+        self.received += len(chunk)
+        self._extractor.feed(self._decoder.decode(chunk))
+
+    def text(self):
+        if not self.done:
+            self._extractor.feed(self._decoder.decode(b'', final=True))
+        return self._extractor.text()
+
+
+def extract_chunks(chunks, limit=None, max_bytes=None, encoding='utf-8', backend=None):
+    """Extract visible text from an iterable of raw byte chunks, reading only as much as needed"""
+    extractor = ByteStreamExtractor(limit, max_bytes, encoding, backend)
+    for chunk in chunks:
+        extractor.feed(chunk)
+        if extractor.done:
+            break
+    return extractor.text()
+
+
+def extract_response_text(response, limit=None, max_bytes=None, backend=None):
+    """Extract visible text from a streamed requests response (session.get(..., stream=True)).
+
+    The response is closed afterwards; when the limits stop the read early the
+    rest of the body is never downloaded.
+    """
+    encoding = charset_from_content_type(response.headers.get('Content-Type'))
+    try:
+        return extract_chunks(response.iter_content(CHUNK_SIZE), limit, max_bytes, encoding, backend)
+    finally:
+        response.close()
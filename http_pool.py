@@ -0,0 +1,89 @@
+"""
+FIFI HTTP Pool - Shared keep-alive connection pools for page fetches and the OpenAI API
+One requests.Session is shared by every thread, so repeated fetches from the
+same iusb.edu hosts reuse open TCP+TLS connections instead of handshaking on
+every request. Pool sizes, retries and backoff come from api_config.py.
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def create_session(pool_connections=10, pool_maxsize=16, pool_block=False,
+                   retries=2, backoff_factor=0.3, retry_statuses=(429, 500, 502, 503, 504)):
+    """Create a requests.Session with bounded per-host keep-alive pools and retry/backoff.
+
+    pool_connections is the number of hosts to keep pools for and pool_maxsize the
+    number of connections kept open per host. With pool_block, requests wait for a
+    free connection instead of opening extra ones past the per-host limit.
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=retry_statuses,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block,
+        max_retries=retry,
+    )
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['User-Agent'] = USER_AGENT
+    return session
+
+
+def get_session():
+    """Return the process-wide pooled session, creating it from api_config on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                from api_config import HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_POOL_BLOCK
+                from api_config import HTTP_RETRIES, HTTP_BACKOFF_FACTOR, HTTP_RETRY_STATUSES
+
+                _session = create_session(
+                    pool_connections=HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=HTTP_POOL_MAXSIZE,
+                    pool_block=HTTP_POOL_BLOCK,
+                    retries=HTTP_RETRIES,
+                    backoff_factor=HTTP_BACKOFF_FACTOR,
+                    retry_statuses=HTTP_RETRY_STATUSES,
+                )
+    return _session
+
+
+def openai_client_options(async_client=False):
+    """Keyword arguments giving an OpenAI client an explicitly sized keep-alive pool"""
+    import httpx
+    from api_config import OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE, OPENAI_KEEPALIVE_EXPIRY
+    from api_config import OPENAI_TIMEOUT, OPENAI_MAX_RETRIES
+
+    limits = httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+    )
+    client_class = httpx.AsyncClient if async_client else httpx.Client
+    return {
+        'http_client': client_class(limits=limits, timeout=OPENAI_TIMEOUT),
+        'max_retries': OPENAI_MAX_RETRIES,
+        'timeout': OPENAI_TIMEOUT,
+    }
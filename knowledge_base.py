@@ -3,6 +3,10 @@ FIFI Knowledge Base - Pre-loaded information for frequently asked questions
 This provides instant, accurate answers without needing to fetch web pages
 """
 
+from collections import namedtuple
+
+from rule_engine import RuleEngine
+
 LIBRARY_INFO = {
     "hours": """
 SCHURZ LIBRARY HOURS:
@@ -253,77 +257,97 @@ Faculty: https://clas.iusb.edu/computer-science-informatics/people/faculty-staff
 """
 
 
+SUBJECT_LIBRARIAN_ANSWERS = {
+    "computing": "The subject librarian for Computer Science, Informatics, and Mathematical Sciences is KIRBY CHENG.\nSchedule an appointment: https://libcal.iusb.edu/appointments/kirbycheng",
+    "health": "The subject librarian for Health Sciences, Nursing, and Psychology is SUSAN THOMAS.\nSchedule an appointment: https://libcal.iusb.edu/appointments/susanthomas",
+    "education": "The subject librarian for Education is SCOTT OPASIK.\nSchedule an appointment: https://libcal.iusb.edu/appointments/scottopasik",
+}
+
+# Answer keys used by the rule table
+STATIC_ANSWERS = {
+    **{f"library.{key}": answer for key, answer in LIBRARY_INFO.items()},
+    **{f"admissions.{key}": answer for key, answer in ADMISSIONS_INFO.items()},
+    **{f"campus.{key}": answer for key, answer in CAMPUS_INFO.items()},
+    **{f"librarian.{key}": answer for key, answer in SUBJECT_LIBRARIAN_ANSWERS.items()},
+    "cs.department": CS_DEPARTMENT_INFO,
+}
+
+# Rules are checked in order and the first match wins. A rule matches when the
+# question contains any trigger and, if `requires` is given, any of those terms
+# too. Terms are matched as substrings of the lowercased question. `weight` is
+# how sure a well-supported match is; `weak` terms can fire a rule but don't
+# count as evidence for answering without the model, and `unless` terms mean the
+# question is about something the answer doesn't cover (see rule_engine.RuleEngine.confidence).
+STATIC_RULES = [
+    {"topic": "library_hours", "triggers": ["hour", "open", "close", "when"], "weak": ["when"],
+     "requires": ["library", "schurz"], "answer": "library.hours", "weight": 0.8},
+    {"topic": "room_reservation", "triggers": ["room", "study room", "reserve", "reservation", "book a room"],
+     "requires": ["study", "room", "conference"], "answer": "library.room_reservation", "weight": 0.6},
+    {"topic": "borrowing", "triggers": ["borrow", "checkout", "check out", "loan", "renew"],
+     "requires": ["book", "library"], "weak": ["library"],
+     "unless": ["another library", "other library", "interlibrary", "laptop", "charger", "calculator"],
+     "answer": "library.borrowing", "weight": 0.8},
+    {"topic": "printing", "triggers": ["print", "printing", "printer", "scan", "scanner", "3d print"],
+     "answer": "library.printing", "weight": 0.8},
+    {"topic": "subject_librarians", "triggers": ["librarian"],
+     "requires": ["subject", "who"], "answer": "library.subject_librarians", "weight": 0.85},
+    {"topic": "librarian_computing", "triggers": ["librarian"],
+     "requires": ["computer", "math", "informatics"], "answer": "librarian.computing", "weight": 0.9},
+    {"topic": "librarian_health", "triggers": ["librarian"],
+     "requires": ["nursing", "health", "psychology"], "answer": "librarian.health", "weight": 0.9},
+    {"topic": "librarian_education", "triggers": ["librarian"],
+     "requires": ["business", "education"], "answer": "librarian.education", "weight": 0.8},
+    {"topic": "course_reserves", "triggers": ["reserve"],
+     "requires": ["course", "class", "textbook"], "answer": "library.reserves", "weight": 0.85},
+    {"topic": "werc_services", "triggers": ["werc", "laminator", "die cut"],
+     "answer": "library.werc_services", "weight": 0.9},
+    {"topic": "werc_services", "triggers": ["button"],
+     "requires": ["make"], "answer": "library.werc_services", "weight": 0.7},
+    {"topic": "admissions", "triggers": ["admission", "apply", "application", "requirement", "enroll"],
+     "answer": "admissions.requirements", "weight": 0.5},
+    {"topic": "tuition", "triggers": ["tuition", "cost", "fee", "price", "how much", "financial aid", "fafsa"],
+     "weak": ["fee"], "answer": "admissions.tuition", "weight": 0.6},
+    {"topic": "parking", "triggers": ["parking", "park"],
+     "answer": "campus.parking", "weight": 0.75},
+    {"topic": "campus_map", "triggers": ["map"],
+     "answer": "campus.maps", "weight": 0.6},
+    {"topic": "campus_map", "triggers": ["where"],
+     "requires": ["building"], "answer": "campus.maps", "weight": 0.6},
+    {"topic": "contact", "triggers": ["contact", "phone", "phone number"], "weak": ["phone"],
+     "answer": "campus.contact", "weight": 0.8},
+    {"topic": "contact", "triggers": ["call", "address"],
+     "answer": "campus.contact", "weight": 0.5},
+    {"topic": "cs_department", "triggers": ["dana", "vrajitoru"],
+     "answer": "cs.department", "weight": 0.9},
+    {"topic": "cs_department", "triggers": ["computer science"],
+     "requires": ["chair", "department", "head"], "answer": "cs.department", "weight": 0.85},
+]
+
+StaticMatch = namedtuple('StaticMatch', ['topic', 'answer', 'confidence'])
+
+_rules = RuleEngine(STATIC_RULES)
+for _rule in _rules.rules:
+    if _rule.answer not in STATIC_ANSWERS:
+        raise KeyError(f"Static rule {_rule.topic!r} uses unknown answer key {_rule.answer!r}")
+
+
+def match_static_answer(query):
+    """Return a StaticMatch (topic, answer text, confidence 0-1) for a query, or None"""
+    match = _rules.match(query)
+    if match is None:
+        return None
+    return StaticMatch(match.topic, STATIC_ANSWERS[match.answer], match.confidence)
+
+
+def render_static_answer(match):
+    """Format a static answer to send to the user as-is, without the model rephrasing it"""
+    return f"{match.answer.strip()}\n\nIs there anything else I can help you with?"
+
+
 def get_static_answer(query):
     """
     Check if query matches any pre-loaded knowledge and return it.
     Returns None if no match found.
     """
-    query_lower = query.lower()
-
-    # Library hours
-    if any(word in query_lower for word in ['hour', 'open', 'close', 'when']):
-        if 'library' in query_lower or 'schurz' in query_lower:
-            return LIBRARY_INFO["hours"]
-
-    # Room reservation
-    if any(word in query_lower for word in ['room', 'study room', 'reserve', 'reservation', 'book a room']):
-        if 'study' in query_lower or 'room' in query_lower or 'conference' in query_lower:
-            return LIBRARY_INFO["room_reservation"]
-
-    # Borrowing books
-    if any(word in query_lower for word in ['borrow', 'checkout', 'check out', 'loan', 'renew']):
-        if 'book' in query_lower or 'library' in query_lower:
-            return LIBRARY_INFO["borrowing"]
-
-    # Printing
-    if any(word in query_lower for word in ['print', 'printing', 'printer', 'scan', 'scanner', '3d print']):
-        return LIBRARY_INFO["printing"]
-
-    # Subject librarians
-    if 'librarian' in query_lower and ('subject' in query_lower or 'who' in query_lower):
-        return LIBRARY_INFO["subject_librarians"]
-
-    # Specific librarian for a subject
-    if 'librarian' in query_lower:
-        if 'computer' in query_lower or 'math' in query_lower or 'informatics' in query_lower:
-            return "The subject librarian for Computer Science, Informatics, and Mathematical Sciences is KIRBY CHENG.\nSchedule an appointment: https://libcal.iusb.edu/appointments/kirbycheng"
-        if 'nursing' in query_lower or 'health' in query_lower or 'psychology' in query_lower:
-            return "The subject librarian for Health Sciences, Nursing, and Psychology is SUSAN THOMAS.\nSchedule an appointment: https://libcal.iusb.edu/appointments/susanthomas"
-        if 'business' in query_lower or 'education' in query_lower:
-            return "The subject librarian for Education is SCOTT OPASIK.\nSchedule an appointment: https://libcal.iusb.edu/appointments/scottopasik"
-
-    # Course reserves
-    if 'reserve' in query_lower and ('course' in query_lower or 'class' in query_lower or 'textbook' in query_lower):
-        return LIBRARY_INFO["reserves"]
-
-    # WERC services
-    if 'werc' in query_lower or ('laminator' in query_lower) or ('die cut' in query_lower) or ('button' in query_lower and 'make' in query_lower):
-        return LIBRARY_INFO["werc_services"]
-
-    # Admissions
-    if any(word in query_lower for word in ['admission', 'apply', 'application', 'requirement', 'enroll']):
-        return ADMISSIONS_INFO["requirements"]
-
-    # Tuition
-    if any(word in query_lower for word in ['tuition', 'cost', 'fee', 'price', 'how much', 'financial aid', 'fafsa']):
-        return ADMISSIONS_INFO["tuition"]
-
-    # Parking
-    if 'parking' in query_lower or 'park' in query_lower:
-        return CAMPUS_INFO["parking"]
-
-    # Campus map
-    if 'map' in query_lower or 'where' in query_lower and 'building' in query_lower:
-        return CAMPUS_INFO["maps"]
-
-    # Contact info
-    if 'contact' in query_lower or 'phone' in query_lower or 'call' in query_lower or 'address' in query_lower:
-        return CAMPUS_INFO["contact"]
-
-    # CS Department / Dana Vrajitoru
-    if 'dana' in query_lower or 'vrajitoru' in query_lower:
-        return CS_DEPARTMENT_INFO
-    if 'computer science' in query_lower and ('chair' in query_lower or 'department' in query_lower or 'head' in query_lower):
-        return CS_DEPARTMENT_INFO
-
-    return None
+    match = match_static_answer(query)
+    return match.answer if match else None
@@ -0,0 +1,168 @@
+"""
+FIFI Metrics - In-process counters and latency histograms in Prometheus text format
+Counters and fixed-bucket histograms are plain dicts behind a lock, so recording
+costs about a microsecond and can stay on in production. Existing stats() dicts
+(caches, sessions, coalescing, prefetch) are read at scrape time through
+collectors instead of being copied on every request.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; covers cache hits (sub-millisecond) up to slow model calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def format_labels(names, values, extra=()):
+    """Render a {name="value",...} label set (empty string for no labels)"""
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def format_value(value):
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic counter, optionally split by label values"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        for labelvalues, value in values:
+            lines.append(f'{self.name}{format_labels(self.labelnames, labelvalues)} {format_value(value)}')
+        return lines
+
+
+class _Timer:
+    """Context manager that observes its elapsed time into a histogram"""
+
+    __slots__ = ('histogram', 'labelvalues', 'start')
+
+    def __init__(self, histogram, labelvalues):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labelvalues)
+        return False
+
+
+class Histogram:
+    """Fixed-bucket histogram, optionally split by label values"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *labelvalues):
+        """Time a block: `with histogram.time('stage'): ...`"""
+        return _Timer(self, labelvalues)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((labelvalues, (list(counts), total, count))
+                            for labelvalues, (counts, total, count) in self._series.items())
+        for labelvalues, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else format_value(bound)
+                labels = format_labels(self.labelnames, labelvalues, [('le', le)])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = format_labels(self.labelnames, labelvalues)
+            lines.append(f'{self.name}_sum{labels} {format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """A set of metrics and stats collectors rendered together for /metrics"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collect(self, prefix, stats, label=None):
+        """Export a stats() callable at scrape time: each numeric key becomes `<prefix>_<key>`.
+
+        If stats() returns a dict of dicts, the outer keys become values of `label`.
+        """
+        self._collectors.append((prefix, stats, label))
+
+    def _collected(self, prefix, stats, label):
+        """Group a stats() result into {metric name: [(labels, value)]}"""
+        values = stats()
+        groups = values.items() if label else [(None, values)]
+        samples = {}
+        for group, group_values in groups:
+            labels = [(label, group)] if label else []
+            for key, value in group_values.items():
+                if isinstance(value, (bool, int, float)):
+                    samples.setdefault(f'{prefix}_{key}', []).append((labels, value))
+        return samples
+
+    def render(self):
+        """Return every metric in Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, stats, label in self._collectors:
+            try:
+                samples = self._collected(prefix, stats, label)
+            except Exception:
+                continue  # one broken collector shouldn't take the whole scrape down
+            for name, values in samples.items():
+                lines.append(f'# TYPE {name} untyped')
+                for labels, value in values:
+                    lines.append(f'{name}{format_labels((), (), labels)} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
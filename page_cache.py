@@ -0,0 +1,142 @@
+"""
+FIFI Page Cache - Persistent on-disk cache of extracted page text
+Entries are keyed by URL, expire after a TTL and are revalidated with
+ETag / If-Modified-Since so an unchanged page costs no re-download or re-parse
+"""
+
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+CachedPage = namedtuple('CachedPage', ['url', 'text', 'etag', 'last_modified', 'fetched_at'])
+
+
+class PageCache:
+    """SQLite-backed page text cache with TTL and size-bounded LRU eviction"""
+
+    def __init__(self, path, ttl=6 * 60 * 60, max_bytes=50 * 1024 * 1024, touch_interval=5):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed_at)')
+        self._conn.commit()
+
+    def get(self, url):
+        """Return the cached entry for a URL (fresh or stale), or None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT url, text, etag, last_modified, fetched_at, accessed_at FROM pages WHERE url = ?',
+                (url,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            # Hot pages would otherwise cost a write per hit; LRU order only needs to be roughly right
+            now = time.time()
+            if now - row[5] >= self.touch_interval:
+                self._conn.execute('UPDATE pages SET accessed_at = ? WHERE url = ?', (now, url))
+                self._conn.commit()
+            entry = CachedPage(*row[:5])
+            if self.is_fresh(entry):
+                self.hits += 1
+        return entry
+
+    def peek(self, url):
+        """Return the cached entry for a URL without counting a hit or marking it as used"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT url, text, etag, last_modified, fetched_at FROM pages WHERE url = ?',
+                (url,)
+            ).fetchone()
+        return CachedPage(*row) if row else None
+
+    def recent_urls(self, limit):
+        """Return the URLs of the most recently used entries, newest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT url FROM pages ORDER BY accessed_at DESC LIMIT ?', (limit,)
+            ).fetchall()
+        return [url for url, in rows]
+
+    def is_fresh(self, entry):
+        """Check whether an entry is still within its TTL"""
+        return time.time() - entry.fetched_at < self.ttl
+
+    def validators(self, entry):
+        """Build conditional request headers for revalidating a stale entry"""
+        headers = {}
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def touch(self, url):
+        """Mark an entry as fresh again after a 304 Not Modified response"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE url = ?',
+                (now, now, url)
+            )
+            self._conn.commit()
+            self.revalidated += 1
+
+    def put(self, url, text, etag=None, last_modified=None):
+        """Store extracted page text and evict least recently used entries over the size cap"""
+        now = time.time()
+        size = len(text.encode('utf-8'))
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, text, etag, last_modified, now, now, size)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM pages').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute('SELECT url, size FROM pages ORDER BY accessed_at').fetchall()
+        for url, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute('DELETE FROM pages WHERE url = ?', (url,))
+            total -= size
+            self.evictions += 1
+
+    def stats(self):
+        """Return the cache counters"""
+        with self._lock:
+            count, total = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages').fetchone()
+            return {
+                'entries': count,
+                'bytes': total,
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidated': self.revalidated,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,60 @@
+"""
+FIFI Passages - Split page text into overlapping passages and pack the best ones into a prompt
+"""
+
+from collections import namedtuple
+
+# A slice of a page's text; `text` is filled in once the passage has been selected
+Passage = namedtuple('Passage', ['url', 'start', 'end', 'text', 'score'])
+
+
+def split_passages(text, size=800, overlap=200):
+    """Return (start, end) offsets of overlapping passages, cut at word boundaries"""
+    spans = []
+    start = 0
+    length = len(text)
+    while start < length:
+        end = min(start + size, length)
+        if end < length:
+            cut = text.rfind(' ', start + size // 2, end)
+            if cut > start:
+                end = cut
+        spans.append((start, end))
+        if end >= length:
+            break
+
+        # Step back by the overlap, then forward to the start of the next word
+        next_start = max(end - overlap, start + 1)
+        space = text.find(' ', next_start, end)
+        start = space + 1 if space != -1 else next_start
+    return spans
+
+
+def pack_passages(passages, budget):
+    """Pack the highest-scoring passages into at most `budget` characters of context.
+
+    Passages overlapping one already chosen from the same page are skipped.
+    Returns the context text and the list of source URLs it draws from.
+    """
+    chosen = {}
+    used = 0
+    for passage in sorted(passages, key=lambda p: p.score, reverse=True):
+        if used + len(passage.text) > budget:
+            continue
+        spans = chosen.setdefault(passage.url, [])
+        if any(passage.start < end and start < passage.end for start, end, _ in spans):
+            continue
+        spans.append((passage.start, passage.end, passage.text))
+        used += len(passage.text)
+
+    context_parts = []
+    sources = []
+    for url, spans in chosen.items():
+        if not spans:
+            continue
+        text = " ... ".join(text for _, _, text in sorted(spans))
+        context_parts.append(f"Source: {url}\n{text}")
+        sources.append(url)
+
+    context = "\n\n---\n\n".join(context_parts) if context_parts else ""
+    return context, sources
@@ -0,0 +1,66 @@
+"""
+FIFI Pattern Matcher - Aho-Corasick multi-pattern substring search
+Finds which of a fixed set of strings occur in a text in a single pass,
+including overlapping ones ("date" inside "graduate"), so it gives exactly the
+same answers as checking `pattern in text` for each pattern separately.
+"""
+
+from collections import deque
+
+
+class PatternMatcher:
+    """Aho-Corasick automaton compiled once from a fixed set of patterns"""
+
+    def __init__(self, patterns):
+        self.patterns = sorted(set(p for p in patterns if p))
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+
+        for pattern in self.patterns:
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                state = next_state
+            self._output[state] = (pattern,)
+
+        # Breadth-first pass to link each state to its longest proper suffix state
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+        # Resolve the failure links ahead of time, so a scan takes one lookup per character.
+        # A state's fail target is shallower, so breadth-first order has always filled it in.
+        self._delta = [None] * len(self._goto)
+        self._delta[0] = dict(self._goto[0])
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            self._delta[state] = {**self._delta[self._fail[state]], **self._goto[state]}
+            queue.extend(self._goto[state].values())
+
+    def find_all(self, text):
+        """Return the set of patterns that occur anywhere in text"""
+        delta = self._delta
+        output = self._output
+        found = set()
+        state = 0
+        for char in text:
+            state = delta[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
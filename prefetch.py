@@ -0,0 +1,125 @@
+"""
+FIFI Prefetch - Background refresh of the most requested pages
+Counts how often each page is picked as context for a question and, from a
+background thread, revalidates or re-downloads the hottest ones shortly before
+their page cache entry expires, so the request path almost always finds a
+fresh page. Counts decay after every pass so the hot set follows current
+traffic. Pass timing and refresh start times are jittered to avoid bursts.
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Prefetcher:
+    """Keeps the hottest pages in a PageCache fresh by calling refresh(url) ahead of expiry"""
+
+    def __init__(self, refresh, cache, hot_size=50, interval=60, refresh_ahead=0.2,
+                 workers=4, jitter=0.2, decay=0.9):
+        self.refresh = refresh
+        self.cache = cache
+        self.hot_size = hot_size
+        self.interval = interval
+        self.refresh_ahead = refresh_ahead
+        self.workers = workers
+        self.jitter = jitter
+        self.decay = decay
+        self.passes = 0
+        self.refreshed = 0
+        self.failed = 0
+        self.last_pass_seconds = 0.0
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def record(self, urls):
+        """Count a request for each URL"""
+        with self._lock:
+            for url in urls:
+                self._counts[url] = self._counts.get(url, 0.0) + 1.0
+
+    def hot_urls(self):
+        """The most requested URLs, hottest first"""
+        with self._lock:
+            ranked = sorted(self._counts.items(), key=lambda item: item[1], reverse=True)
+        return [url for url, _ in ranked[:self.hot_size]]
+
+    def is_due(self, url, now=None):
+        """Check whether a page is missing from the cache or close enough to expiry to refresh"""
+        entry = self.cache.peek(url)
+        if entry is None:
+            return True
+        age = (now or time.time()) - entry.fetched_at
+        return age >= self.cache.ttl * (1 - self.refresh_ahead)
+
+    def _refresh(self, url, delay):
+        """Refresh one page after a jitter delay, counting whether its cache entry was renewed"""
+        if self._stop.wait(delay):
+            return
+        before = self.cache.peek(url)
+        try:
+            self.refresh(url)
+        except Exception:
+            pass
+        after = self.cache.peek(url)
+        renewed = after is not None and (before is None or after.fetched_at > before.fetched_at)
+        with self._lock:
+            if renewed:
+                self.refreshed += 1
+            else:
+                self.failed += 1
+
+    def run_pass(self, urls=None):
+        """Refresh every due URL (the hot set by default) with bounded concurrency"""
+        start = time.time()
+        due = [url for url in (self.hot_urls() if urls is None else urls) if self.is_due(url, start)]
+        spread = self.jitter * self.interval
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='fifi-prefetch') as pool:
+            for url in due:
+                pool.submit(self._refresh, url, random.uniform(0, spread) if urls is None else 0)
+
+        with self._lock:
+            # Older requests count for less each pass; forget URLs nobody asks about any more
+            self._counts = {url: count * self.decay for url, count in self._counts.items()
+                            if count * self.decay >= 0.1}
+            self.passes += 1
+            self.last_pass_seconds = time.time() - start
+        return len(due)
+
+    def warm(self, urls):
+        """Load pages into the cache right away and seed the hot set with them"""
+        urls = list(urls)
+        with self._lock:
+            for url in urls:
+                self._counts.setdefault(url, 1.0)
+        return self.run_pass(urls)
+
+    def _run(self, warm_urls):
+        self.warm(warm_urls)
+        while not self._stop.wait(self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)):
+            self.run_pass()
+
+    def start(self, warm_urls=()):
+        """Warm the cache with warm_urls, then keep the hot set fresh from a daemon thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(warm_urls,),
+                                            name='fifi-prefetch', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the refresh thread after its current pass; pending refreshes are skipped"""
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tracked_urls': len(self._counts),
+                'passes': self.passes,
+                'refreshed': self.refreshed,
+                'failed': self.failed,
+                'last_pass_seconds': round(self.last_pass_seconds, 3),
+                'running': self._thread is not None and self._thread.is_alive(),
+            }
@@ -0,0 +1,182 @@
+"""
+FIFI Prompt Builder - Token-budgeted prompt assembly and rolling history summaries
+Tokens are counted with tiktoken for the configured model when it is installed
+(otherwise estimated at ~4 characters per token). A fixed input budget is split
+between the system prompt, a summary of older turns, the most recent turns and
+the retrieved context, and the completion limit is capped to what still fits in
+the model's context window. Older turns are folded into a short extractive
+summary kept at the start of the session history instead of being resent.
+"""
+
+import re
+import threading
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken is optional
+    tiktoken = None
+
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD = 4  # tokens of formatting around every chat message
+REPLY_OVERHEAD = 3  # tokens priming the assistant's reply
+
+SOURCE_SEPARATOR = "\n\n---\n\n"  # between sources in the packed context (see passages.pack_passages)
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s')
+
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+
+def get_encoding(model):
+    """Return the tiktoken encoding for a model, or None to fall back to estimates"""
+    if tiktoken is None:
+        return None
+    with _encodings_lock:
+        if model not in _encodings:
+            try:
+                try:
+                    _encodings[model] = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    # Unknown model name - use the encoding of current chat models
+                    _encodings[model] = tiktoken.get_encoding('cl100k_base')
+            except Exception:
+                # The encoding files could not be loaded (e.g. offline) - estimate instead
+                _encodings[model] = None
+        return _encodings[model]
+
+
+def count_tokens(text, model='gpt-3.5-turbo'):
+    """Count the tokens in a piece of text"""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages, model='gpt-3.5-turbo'):
+    """Count the prompt tokens a list of chat messages costs"""
+    return sum(count_tokens(m.get('content') or '', model) + MESSAGE_OVERHEAD for m in messages) + REPLY_OVERHEAD
+
+
+def truncate_to_tokens(text, limit, model='gpt-3.5-turbo'):
+    """Cut text down to at most `limit` tokens"""
+    if limit <= 0:
+        return ""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return text[:limit * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= limit:
+        return text
+    return encoding.decode(tokens[:limit])
+
+
+def lead_sentences(text, min_chars=60, max_chars=160):
+    """The opening sentences of a message (at least min_chars when possible), shortened to max_chars"""
+    lead = ''
+    for sentence in SENTENCE_END_RE.split(' '.join(text.split())):
+        lead = f"{lead} {sentence}" if lead else sentence
+        if len(lead) >= min_chars:
+            break
+    return lead if len(lead) <= max_chars else lead[:max_chars - 3].rstrip() + '...'
+
+
+def is_summary(message):
+    """Check whether a history message is the rolling summary"""
+    return message.get('role') == 'system' and (message.get('content') or '').startswith(SUMMARY_PREFIX)
+
+
+def summarize_turns(summary, messages, budget, model='gpt-3.5-turbo'):
+    """Fold messages into a summary: one line per exchange, oldest lines dropped past the budget"""
+    lines = summary[len(SUMMARY_PREFIX):].splitlines() if summary else []
+    for message in messages:
+        text = lead_sentences(message.get('content') or '')
+        if message.get('role') == 'user':
+            lines.append(f"- User asked: {text}")
+        elif lines and lines[-1].startswith('- User asked:'):
+            lines[-1] += f" FIFI answered: {text}"
+        else:
+            lines.append(f"- FIFI said: {text}")
+
+    while len(lines) > 1 and count_tokens(SUMMARY_PREFIX + '\n'.join(lines), model) > budget:
+        lines.pop(0)
+    return SUMMARY_PREFIX + '\n'.join(lines)
+
+
+def compact_history(history, recent_messages=4, summary_budget=200, model='gpt-3.5-turbo'):
+    """Keep the last `recent_messages` messages verbatim and fold older ones into the summary"""
+    summary = None
+    if history and is_summary(history[0]):
+        summary = history[0]['content']
+        history = history[1:]
+    if len(history) <= recent_messages:
+        older, recent = [], history
+    else:
+        older, recent = history[:-recent_messages], history[-recent_messages:]
+    if older:
+        summary = summarize_turns(summary, older, summary_budget, model)
+    return ([{'role': 'system', 'content': summary}] if summary else []) + list(recent)
+
+
+class PromptBuilder:
+    """Assembles chat messages for a model within a fixed input token budget"""
+
+    def __init__(self, system_message, model='gpt-3.5-turbo', budget=2500, history_budget=600,
+                 max_completion=1000, context_window=16385):
+        self.system_message = system_message
+        self.model = model
+        self.budget = budget
+        self.history_budget = history_budget
+        self.max_completion = max_completion
+        self.context_window = context_window
+        self._system_tokens = count_tokens(system_message, model) + MESSAGE_OVERHEAD
+
+    def _fit_history(self, history, budget):
+        """The rolling summary plus as many recent messages as fit, newest first"""
+        summary = [m for m in history[:1] if is_summary(m)]
+        used = sum(count_tokens(m['content'], self.model) + MESSAGE_OVERHEAD for m in summary)
+        recent = []
+        for message in reversed(history[len(summary):]):
+            cost = count_tokens(message.get('content') or '', self.model) + MESSAGE_OVERHEAD
+            if used + cost > budget:
+                break
+            recent.append(message)
+            used += cost
+        return summary + recent[::-1], used
+
+    def fit_context(self, context, budget):
+        """Drop whole sources from the end of the context until it fits, then cut the last one"""
+        blocks = context.split(SOURCE_SEPARATOR)
+        while len(blocks) > 1 and count_tokens(SOURCE_SEPARATOR.join(blocks), self.model) > budget:
+            blocks.pop()
+        return truncate_to_tokens(SOURCE_SEPARATOR.join(blocks), budget, self.model)
+
+    def user_message(self, query, context):
+        if not context:
+            return query
+        return f"""Question: {query}
+
+Here is relevant information from IU South Bend website:
+
+{context}
+
+Please answer the question based on this information."""
+
+    def build(self, query, context, conversation_history):
+        """Return (messages, max_tokens) for a question, its context and the session history"""
+        history, history_tokens = self._fit_history(conversation_history, self.history_budget)
+
+        # Context gets whatever the system prompt, history and question leave over
+        if context:
+            frame_tokens = count_tokens(self.user_message(query, ' '), self.model) + MESSAGE_OVERHEAD
+            available = self.budget - self._system_tokens - history_tokens - frame_tokens - REPLY_OVERHEAD
+            context = self.fit_context(context, available)
+
+        messages = [{"role": "system", "content": self.system_message}]
+        messages.extend(history)
+        messages.append({"role": "user", "content": self.user_message(query, context)})
+
+        prompt_tokens = count_message_tokens(messages, self.model)
+        max_tokens = max(1, min(self.max_completion, self.context_window - prompt_tokens))
+        return messages, max_tokens
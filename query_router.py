@@ -0,0 +1,104 @@
+"""
+FIFI Query Router - Precompiled keyword-pattern routing of queries to URLs
+The keyword pattern table is compiled once into an Aho-Corasick matcher, and
+every URL is matched against it once up front to build pattern -> URL postings.
+URLs with identical keywords are scored as one class, the words of every URL
+path are indexed for queries that match no pattern, and boosted URLs start from
+their boost, so routing a query never walks the URL list.
+"""
+
+import heapq
+import re
+from itertools import islice
+
+from pattern_matcher import PatternMatcher
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+class QueryRouter:
+    """Scores URLs for a query by how many of the matched URL keywords they contain"""
+
+    def __init__(self, keyword_patterns, urls, boost_terms=(), boost=2):
+        self.urls = urls
+        self.boost = boost
+        self._url_lower = [url.lower() for url in urls]
+
+        # Query matcher: any URL keyword found inside a query word selects its whole group
+        self._groups_by_keyword = {}
+        for url_keywords in keyword_patterns.values():
+            for keyword in url_keywords:
+                self._groups_by_keyword.setdefault(keyword, []).append(url_keywords)
+        self._query_matcher = PatternMatcher(self._groups_by_keyword)
+
+        # Boosted URLs start from the boost
+        boost_matcher = PatternMatcher(boost_terms)
+        self._base = [boost if boost_terms and boost_matcher.find_all(url_lower) else 0
+                      for url_lower in self._url_lower]
+
+        # URLs with the same keywords and boost always score the same, so they are
+        # scored as one class; postings map each URL keyword to the classes containing it
+        url_matcher = PatternMatcher(self._groups_by_keyword)
+        class_ids = {}
+        self._classes = []  # class -> URL indexes in list order
+        self._class_base = []
+        self._class_postings = {}
+        for url_id, url_lower in enumerate(self._url_lower):
+            signature = (frozenset(url_matcher.find_all(url_lower)), self._base[url_id])
+            class_id = class_ids.get(signature)
+            if class_id is None:
+                class_id = class_ids[signature] = len(self._classes)
+                self._classes.append([])
+                self._class_base.append(self._base[url_id])
+                for keyword in signature[0]:
+                    self._class_postings.setdefault(keyword, []).append(class_id)
+            self._classes[class_id].append(url_id)
+        self._boosted_classes = [class_id for class_id, base in enumerate(self._class_base) if base]
+
+        # Word postings for queries that select no pattern: which URLs have each path word
+        self._word_postings = {}
+        for url_id, url_lower in enumerate(self._url_lower):
+            for word in set(WORD_RE.findall(url_lower)):
+                self._word_postings.setdefault(word, []).append(url_id)
+
+    def match_patterns(self, query):
+        """Return the URL keywords selected by a query"""
+        matched = set()
+        for keyword in self._query_matcher.find_all(query.lower()):
+            for url_keywords in self._groups_by_keyword[keyword]:
+                matched.update(url_keywords)
+        return matched
+
+    def _candidates(self, query, limit=None):
+        """Yield (score, URL indexes in list order) for every set of URLs with a positive score.
+
+        Only the first `limit` URLs of each set are yielded, since ties go to the earlier URL.
+        """
+        matched = self.match_patterns(query)
+        if matched:
+            counts = {}
+            for keyword in matched:
+                for class_id in self._class_postings.get(keyword, ()):
+                    counts[class_id] = counts.get(class_id, 0) + 1
+            for class_id, count in counts.items():
+                yield count + self._class_base[class_id], islice(self._classes[class_id], limit)
+            for class_id in self._boosted_classes:
+                if class_id not in counts:
+                    yield self._class_base[class_id], islice(self._classes[class_id], limit)
+        else:
+            # No known topic - fall back to the query's words, matched against URL path words
+            counts = {}
+            for word in set(WORD_RE.findall(query.lower())):
+                for url_id in self._word_postings.get(word, ()):
+                    counts[url_id] = counts.get(url_id, 0) + 1
+            for url_id, count in counts.items():
+                yield count + self._base[url_id], (url_id,)
+            for class_id in self._boosted_classes:
+                unselected = (url_id for url_id in self._classes[class_id] if url_id not in counts)
+                yield self._class_base[class_id], islice(unselected, limit)
+
+    def route(self, query, limit=8):
+        """Return up to `limit` URLs for a query, ordered by score, ties kept in URL list order"""
+        candidates = ((score, url_id) for score, url_ids in self._candidates(query, limit) for url_id in url_ids)
+        best = heapq.nsmallest(limit, candidates, key=lambda item: (-item[0], item[1]))
+        return [self.urls[url_id] for _, url_id in best]
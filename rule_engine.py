@@ -0,0 +1,127 @@
+"""
+FIFI Rule Engine - Compiled keyword rules for the static knowledge base
+A rule fires when the query contains any of its trigger terms and, if it lists
+required co-terms, at least one of those too. Every term of every rule is
+compiled into one Aho-Corasick matcher, so a query is scanned once no matter
+how many rules there are. Rules are checked in table order and the first one
+that fires wins, with the same substring semantics as `term in query.lower()`.
+Confidence only counts terms that appear as whole words (allowing plural and
+verb endings), so "scan" inside "Scandinavian" picks a rule but can never make
+its answer confident enough to skip the model. A rule may also list `unless`
+terms that never stop it firing but rule out a confident answer ("laptop" in a
+book-borrowing question).
+"""
+
+from collections import namedtuple
+
+from pattern_matcher import PatternMatcher
+
+Rule = namedtuple('Rule', ['topic', 'triggers', 'requires', 'answer', 'weight', 'weak', 'unless'])
+RuleMatch = namedtuple('RuleMatch', ['topic', 'answer', 'confidence', 'terms'])
+
+EXTRA_TERM_BONUS = 0.1  # confidence added for each matched term beyond the minimum needed
+SINGLE_TERM_PENALTY = 0.1  # confidence taken off when a single word is the only evidence
+SUBSTRING_FACTOR = 0.4  # weight multiplier when no strong trigger (or no strong required term) matched as a whole word
+
+# Endings a term may carry and still count as a whole word ("hours", "printer", "closed")
+WORD_SUFFIXES = frozenset(['', 's', 'es', 'd', 'ed', 'ing', 'er', 'ers'])
+
+
+def distinct_terms(terms):
+    """Drop terms that only matched as part of a longer matched term ("print" inside "printing")"""
+    if len(terms) < 2:
+        return terms
+    return {term for term in terms if not any(term != other and term in other for other in terms)}
+
+
+def is_whole_word(text, start, term):
+    """Check that a term found at `start` begins a word and ends it, apart from a WORD_SUFFIXES ending"""
+    if start and text[start - 1].isalnum():
+        return False
+    end = word_end = start + len(term)
+    while word_end < len(text) and text[word_end].isalnum():
+        word_end += 1
+    return text[end:word_end] in WORD_SUFFIXES
+
+
+def whole_words(text, terms):
+    """Return the terms that occur at least once in text as a whole word"""
+    words = set()
+    for term in terms:
+        start = text.find(term)
+        while start != -1:
+            if is_whole_word(text, start, term):
+                words.add(term)
+                break
+            start = text.find(term, start + 1)
+    return words
+
+
+class RuleEngine:
+    """First-match rule table compiled into a single-pass matcher"""
+
+    def __init__(self, rules):
+        self.rules = [self._compile(rule) for rule in rules]
+        for rule in self.rules:
+            if not rule.triggers:
+                raise ValueError(f"Rule {rule.topic!r} has no trigger terms")
+        self._matcher = PatternMatcher(term for rule in self.rules for term in rule.triggers + rule.requires + rule.unless)
+        self._requires = [frozenset(rule.requires) for rule in self.rules]
+        self._rule_terms = [frozenset(rule.triggers + rule.requires + rule.unless) for rule in self.rules]
+
+        # Trigger postings: the rules each term can fire, in table order
+        self._trigger_rules = {}
+        for rule_id, rule in enumerate(self.rules):
+            for term in rule.triggers:
+                self._trigger_rules.setdefault(term, []).append(rule_id)
+
+    @staticmethod
+    def _compile(rule):
+        """Normalize a rule given as a dict (requires, weight, weak and unless are optional) or a Rule"""
+        if not isinstance(rule, Rule):
+            rule = Rule(**{'requires': (), 'weight': 1.0, 'weak': (), 'unless': (), **rule})
+        return rule._replace(triggers=tuple(rule.triggers), requires=tuple(rule.requires),
+                             weak=frozenset(rule.weak), unless=tuple(rule.unless))
+
+    def confidence(self, rule, words):
+        """How sure a match is, from the rule's terms that matched as whole words.
+
+        Full weight needs a non-weak trigger, a non-weak required term (if the
+        rule has any), and at least two words of evidence; each further word adds
+        a little. A single word is marked down, and a match resting on substrings
+        or weak terms alone, or with an `unless` term present, drops to a fraction
+        of the weight.
+        """
+        strong = words - rule.weak
+        if (strong.isdisjoint(rule.triggers) or not words.isdisjoint(rule.unless)
+                or (rule.requires and strong.isdisjoint(rule.requires))):
+            return round(rule.weight * SUBSTRING_FACTOR, 2)
+        count = len(distinct_terms(words))
+        if count < 2:
+            return round(rule.weight - SINGLE_TERM_PENALTY, 2)
+        needed = 2 if rule.requires else 1
+        return round(min(1.0, rule.weight + EXTRA_TERM_BONUS * (count - needed)), 2)
+
+    def match(self, query):
+        """Return the RuleMatch of the first rule that fires for a query, or None"""
+        text = query.lower()
+        found = self._matcher.find_all(text)
+        if not found:
+            return None
+
+        # Postings are in table order, so each term only needs its first rule that fires
+        first = len(self.rules)
+        for term in found:
+            for rule_id in self._trigger_rules.get(term, ()):
+                if rule_id >= first:
+                    break
+                requires = self._requires[rule_id]
+                if not requires or not requires.isdisjoint(found):
+                    first = rule_id
+                    break
+        if first == len(self.rules):
+            return None
+
+        rule = self.rules[first]
+        terms = found & self._rule_terms[first]
+        return RuleMatch(rule.topic, rule.answer, self.confidence(rule, whole_words(text, terms)), terms)
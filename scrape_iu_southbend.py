@@ -1,99 +1,315 @@
 """
 Web scraper to collect URLs related to IU South Bend
+Crawls concurrently: each host has its own FIFO queue, URLs are deduplicated
+when they are enqueued, and politeness is enforced per host (a minimum delay
+between requests and a cap on requests in flight) instead of a global sleep.
+
+Re-crawls are incremental: the crawl state (crawl_state.db) remembers every
+page's validators and content hash, each host's sitemap.xml is used as an
+extra seed list, pages the sitemap reports as unmodified since the last visit
+are not fetched at all, and the rest are requested conditionally.
 """
 
+import os
+import time
+import xml.etree.ElementTree as ElementTree
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timezone
+from urllib.parse import urljoin, urlparse
+
 import requests
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
-import time
+from crawl_state import CrawlState, content_hash
+from http_pool import get_session
+
+# Starting URLs including faculty and department pages
+SEED_URLS = [
+    "https://www.iusb.edu",
+    "https://www.iusb.edu/academics/index.html",
+    "https://www.iusb.edu/about/index.html",
+    # College and School pages
+    "https://arts.iusb.edu/",
+    "https://education.iusb.edu/",
+    "https://business.iusb.edu/",
+    "https://nursing.iusb.edu/",
+    "https://science.iusb.edu/",
+    "https://liberal-arts.iusb.edu/",
+    # Faculty directories
+    "https://www.iusb.edu/computer-science/",
+    "https://www.iusb.edu/mathematics/",
+    "https://cs.iusb.edu/",
+    "https://math.iusb.edu/",
+    # Specific department pages
+    "https://academics.iusb.edu/",
+    "https://students.iusb.edu/",
+    "https://library.iusb.edu/",
+]
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Result of fetching one page: status is "changed", "not-modified" (304) or "same-hash"
+FetchResult = namedtuple('FetchResult', ['status', 'links', 'body_hash', 'etag', 'last_modified'])
+
+
+class CrawlFrontier:
+    """Per-host URL queues with dedupe at enqueue time and per-host politeness"""
+
+    def __init__(self, host_delay=0.5, host_concurrency=2):
+        self.host_delay = host_delay
+        self.host_concurrency = host_concurrency
+        self.seen = set()
+        self._queues = {}  # host -> deque of URLs waiting to be crawled
+        self._next_allowed = {}  # host -> earliest time of the next request
+        self._in_flight = {}  # host -> requests currently running
+
+    def __len__(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def add(self, url):
+        """Queue a URL unless it has been seen before; returns True if it was queued"""
+        if url in self.seen:
+            return False
+        self.seen.add(url)
+        self._queues.setdefault(urlparse(url).netloc, deque()).append(url)
+        return True
+
+    def _ready(self, host, now):
+        return (self._queues[host]
+                and self._in_flight.get(host, 0) < self.host_concurrency
+                and self._next_allowed.get(host, 0.0) <= now)
+
+    def pop_ready(self, now):
+        """Take the next URL from a host that may be contacted now, or None"""
+        for host in self._queues:
+            if self._ready(host, now):
+                self._in_flight[host] = self._in_flight.get(host, 0) + 1
+                self._next_allowed[host] = now + self.host_delay
+                return self._queues[host].popleft()
+        return None
+
+    def release(self, url):
+        """Mark a URL's request as finished so its host can take another one"""
+        host = urlparse(url).netloc
+        self._in_flight[host] -= 1
+
+    def seconds_until_ready(self, now):
+        """Time until some queued URL may be fetched (0 if one is ready, None if none can be)"""
+        waits = [max(0.0, self._next_allowed.get(host, 0.0) - now)
+                 for host, queue in self._queues.items()
+                 if queue and self._in_flight.get(host, 0) < self.host_concurrency]
+        return min(waits) if waits else None
+
+
+def clean_url(url):
+    """Drop the fragment from a URL"""
+    parsed = urlparse(url)
+    cleaned = f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
+    if parsed.query:
+        cleaned += f"?{parsed.query}"
+    return cleaned
+
+
+def parse_lastmod(value):
+    """Convert a sitemap <lastmod> W3C datetime to a Unix timestamp, or None"""
+    try:
+        parsed = datetime.fromisoformat(value.strip())
+    except (AttributeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
 
-def scrape_iu_southbend_urls():
+
+def fetch_sitemap(session, sitemap_url, depth=2):
+    """Return {url: lastmod timestamp or None} from a sitemap, following sitemap indexes"""
+    try:
+        response = session.get(sitemap_url, headers=HEADERS, timeout=10)
+        response.raise_for_status()
+        root = ElementTree.fromstring(response.content)
+    except (requests.RequestException, ElementTree.ParseError):
+        return {}
+
+    entries = {}
+    for element in root:
+        fields = {child.tag.rsplit('}', 1)[-1]: (child.text or '').strip() for child in element}
+        loc = fields.get('loc')
+        if not loc:
+            continue
+        if element.tag.endswith('sitemap'):
+            if depth > 0:
+                entries.update(fetch_sitemap(session, loc, depth - 1))
+        else:
+            entries[clean_url(loc)] = parse_lastmod(fields.get('lastmod'))
+    return entries
+
+
+def fetch_links(session, url, record=None, validators=None):
+    """Download a page, conditionally if it was crawled before, and return a FetchResult.
+
+    `validators` are the conditional request headers from CrawlState.validators.
+    Unchanged pages (304 Not Modified, or the same body hash as last time) are not
+    parsed again; their links are taken from the previous crawl.
+    """
+    response = session.get(url, headers={**HEADERS, **(validators or {})}, timeout=10)
+    if record is not None and response.status_code == 304:
+        return FetchResult('not-modified', record.links, record.content_hash, record.etag, record.last_modified)
+    response.raise_for_status()
+
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    body_hash = content_hash(response.content)
+    if record is not None and body_hash == record.content_hash:
+        return FetchResult('same-hash', record.links, body_hash, etag, last_modified)
+
+    if 'html' not in response.headers.get('Content-Type', 'text/html'):
+        links = []
+    else:
+        soup = BeautifulSoup(response.text, 'html.parser')
+        links = [urljoin(url, link['href']) for link in soup.find_all('a', href=True)]
+    return FetchResult('changed', links, body_hash, etag, last_modified)
+
+
+def scrape_iu_southbend_urls(seed_urls=SEED_URLS, max_pages=None, workers=None,
+                             host_delay=None, host_concurrency=None, state_path=None):
     """Scrape URLs from IU South Bend website"""
+    from api_config import CRAWL_MAX_PAGES, CRAWL_WORKERS, CRAWL_HOST_DELAY, CRAWL_HOST_CONCURRENCY
+    from api_config import CRAWL_STATE_PATH
 
-    # Starting URLs including faculty and department pages
-    seed_urls = [
-        "https://www.iusb.edu",
-        "https://www.iusb.edu/academics/index.html",
-        "https://www.iusb.edu/about/index.html",
-        # College and School pages
-        "https://arts.iusb.edu/",
-        "https://education.iusb.edu/",
-        "https://business.iusb.edu/",
-        "https://nursing.iusb.edu/",
-        "https://science.iusb.edu/",
-        "https://liberal-arts.iusb.edu/",
-        # Faculty directories
-        "https://www.iusb.edu/computer-science/",
-        "https://www.iusb.edu/mathematics/",
-        "https://cs.iusb.edu/",
-        "https://math.iusb.edu/",
-        # Specific department pages
-        "https://academics.iusb.edu/",
-        "https://students.iusb.edu/",
-        "https://library.iusb.edu/",
-    ]
-
-    visited_urls = set()
-    collected_urls = set()
-    urls_to_visit = seed_urls.copy()
+    max_pages = max_pages or CRAWL_MAX_PAGES
+    workers = workers or CRAWL_WORKERS
+    frontier = CrawlFrontier(
+        host_delay=CRAWL_HOST_DELAY if host_delay is None else host_delay,
+        host_concurrency=host_concurrency or CRAWL_HOST_CONCURRENCY
+    )
+    state = CrawlState(state_path or CRAWL_STATE_PATH)
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
+    collected_urls = set()
+    counts = {'changed': 0, 'not-modified': 0, 'same-hash': 0, 'sitemap-skipped': 0, 'errors': 0}
+    pages_started = 0
+    unchanged = deque()  # (url, links) of pages reused from the last crawl without fetching
 
-    max_pages = 150  # Increased limit for more coverage
-    pages_scraped = 0
+    # Keep-alive connections are reused across pages on the same host
+    session = get_session()
 
     print(f"Starting to scrape IU South Bend URLs from {len(seed_urls)} seed URLs")
+    print(f"Up to {max_pages} pages, {workers} workers, {len(state)} pages in crawl state")
     print("-" * 50)
 
-    while urls_to_visit and pages_scraped < max_pages:
-        current_url = urls_to_visit.pop(0)
+    start = time.time()
 
-        if current_url in visited_urls:
-            continue
+    # Sitemaps list pages the link graph may not reach and tell us which ones changed
+    sitemap_urls = sorted({f"{urlparse(url).scheme}://{urlparse(url).netloc}/sitemap.xml" for url in seed_urls})
+    sitemap = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for entries in pool.map(lambda url: fetch_sitemap(session, url), sitemap_urls):
+            sitemap.update(entries)
+    if sitemap:
+        print(f"Found {len(sitemap)} pages in {len(sitemap_urls)} sitemaps")
 
-        visited_urls.add(current_url)
+    def enqueue(url):
+        if url in frontier.seen:
+            return
+        record = state.get(url)
+        lastmod = sitemap.get(url)
+        if record is not None and lastmod is not None and lastmod <= record.last_seen:
+            frontier.seen.add(url)
+            unchanged.append((url, record.links))
+            counts['sitemap-skipped'] += 1
+            state.mark_seen(url)
+        else:
+            frontier.add(url)
 
-        try:
-            response = requests.get(current_url, headers=headers, timeout=10)
-            response.raise_for_status()
+    def process_links(links):
+        for link in links:
+            parsed = urlparse(link)
 
-            soup = BeautifulSoup(response.text, 'html.parser')
+            # Only collect URLs related to IU South Bend
+            if 'iusb.edu' in parsed.netloc or 'southbend' in parsed.netloc.lower():
+                url = clean_url(link)
+                collected_urls.add(url)
 
-            # Find all links on the page
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                full_url = urljoin(current_url, href)
+                # Add to visit queue if it's an iusb.edu page
+                if 'iusb.edu' in parsed.netloc and parsed.scheme in ('http', 'https'):
+                    enqueue(url)
 
-                # Parse the URL
-                parsed = urlparse(full_url)
+    for url in seed_urls:
+        enqueue(url)
+    process_links(sitemap)
 
-                # Only collect URLs related to IU South Bend
-                if 'iusb.edu' in parsed.netloc or 'southbend' in parsed.netloc.lower():
-                    # Clean URL (remove fragments)
-                    clean_url = f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
-                    if parsed.query:
-                        clean_url += f"?{parsed.query}"
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            while unchanged:
+                process_links(unchanged.popleft()[1])
 
-                    collected_urls.add(clean_url)
+            now = time.time()
+            while len(in_flight) < workers and pages_started < max_pages:
+                url = frontier.pop_ready(now)
+                if url is None:
+                    break
+                record = state.get(url)
+                validators = state.validators(record) if record else None
+                in_flight[pool.submit(fetch_links, session, url, record, validators)] = url
+                pages_started += 1
 
-                    # Add to visit queue if it's an iusb.edu page
-                    if 'iusb.edu' in parsed.netloc and clean_url not in visited_urls:
-                        urls_to_visit.append(clean_url)
+            if not in_flight:
+                delay = frontier.seconds_until_ready(time.time())
+                if delay is None or pages_started >= max_pages:
+                    break
+                time.sleep(delay)
+                continue
 
-            pages_scraped += 1
-            print(f"Scraped page {pages_scraped}: {current_url[:60]}...")
+            # Wake up when a page finishes or when a throttled host becomes available;
+            # once nothing more can be started, only a finished page can change anything
+            timeout = None
+            if len(in_flight) < workers and pages_started < max_pages:
+                timeout = frontier.seconds_until_ready(time.time())
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
 
-            # Be respectful - add delay between requests
-            time.sleep(0.5)
+            for future in done:
+                current_url = in_flight.pop(future)
+                frontier.release(current_url)
+                try:
+                    result = future.result()
+                except requests.RequestException as e:
+                    print(f"Error scraping {current_url}: {e}")
+                    counts['errors'] += 1
+                    # Keep following the links we saw last time so one failure doesn't drop a subtree
+                    record = state.get(current_url)
+                    if record is not None:
+                        process_links(record.links)
+                    continue
 
-        except requests.RequestException as e:
-            print(f"Error scraping {current_url}: {e}")
-            continue
+                if result.status == 'not-modified':
+                    state.mark_seen(current_url)
+                else:
+                    state.record(current_url, result.links, result.body_hash, result.etag, result.last_modified)
+                counts[result.status] += 1
+                process_links(result.links)
 
+                pages_scraped = pages_started - len(in_flight)
+                if pages_scraped % 100 == 0 or pages_scraped <= 10:
+                    rate = pages_scraped / max(time.time() - start, 1e-6)
+                    print(f"Scraped page {pages_scraped} ({rate:.1f}/s, {len(frontier)} queued): {current_url[:60]}...")
+
+    print(f"\nFetched {pages_started} pages in {time.time() - start:.1f}s: "
+          f"{counts['changed']} new or changed, {counts['not-modified']} not modified, "
+          f"{counts['same-hash']} identical content, {counts['errors']} errors")
+    print(f"Skipped {counts['sitemap-skipped']} pages the sitemaps report as unchanged")
     return sorted(collected_urls)
 
+
+def read_urls_file(filename):
+    """Read the URLs from a previously saved file, or an empty list if there is none"""
+    if not os.path.exists(filename):
+        return []
+    with open(filename, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
 def save_urls_to_file(urls, filename):
     """Save collected URLs to a file"""
     with open(filename, 'w', encoding='utf-8') as f:
@@ -106,6 +322,7 @@ def save_urls_to_file(urls, filename):
 
     print(f"\nSaved {len(urls)} URLs to {filename}")
 
+
 def main():
     output_file = "iu_southbend_urls.txt"
 
@@ -116,9 +333,18 @@ def main():
 
     print(f"\nTotal unique URLs collected: {len(urls)}")
 
+    previous = read_urls_file(output_file)
+    if urls == previous:
+        print(f"\nNo new or removed URLs, leaving {output_file} unchanged")
+        return
+    added = len(set(urls) - set(previous))
+    removed = len(set(previous) - set(urls))
+    print(f"{added} URLs added, {removed} removed since the last run")
+
     save_urls_to_file(urls, output_file)
 
     print(f"\nDone! Check '{output_file}' for the results.")
 
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,208 @@
+"""
+FIFI Search Index - BM25 inverted index over passages of extracted page text
+Pages are split into overlapping passages at index time. Built from the corpus
+snapshot, either at startup or offline with `python search_index.py` so large
+corpora don't slow down app startup.
+"""
+
+import heapq
+import math
+import os
+import pickle
+import re
+import sys
+import time
+from array import array
+from collections import Counter
+
+from passages import Passage, split_passages
+
+INDEX_VERSION = 2
+
+# Only the highest-impact postings of each query term are scanned, which keeps
+# very common terms from dominating query time on large corpora. This makes top-k
+# approximate: a passage whose weight for a common term falls past the cutoff
+# loses that term's share of its score, so it can rank lower or drop out. There is
+# no bound check, so nothing tells a query when this happened; terms with fewer
+# postings than the cutoff, i.e. every term on small corpora, are scored exactly
+MAX_POSTINGS_SCANNED = 1000
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+STOPWORDS = frozenset("""
+a about after all also am an and any are as at be been but by can could did do does
+for from get go had has have how i if in into is it its just me more my no not of on
+or our out so than that the their them then there these they this to up us was we
+were what when where which who why will with would you your www http https html index
+""".split())
+
+
+def tokenize(text):
+    """Split text into lowercase index terms, dropping stopwords and folding simple plurals"""
+    terms = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+class SearchIndex:
+    """BM25 index over page passages with compact, impact-ordered postings.
+
+    Each term maps to two parallel arrays: passage ids ('I') and precomputed
+    BM25 term weights ('f'), sorted by weight so queries can scan just the
+    highest-impact postings of each term (see MAX_POSTINGS_SCANNED).
+    Passages are stored as (page, start, end) offsets, not copies of the text.
+    """
+
+    def __init__(self, urls, passage_pages, passage_starts, passage_ends, postings, corpus_built_at=None):
+        self.urls = urls
+        self.passage_pages = passage_pages
+        self.passage_starts = passage_starts
+        self.passage_ends = passage_ends
+        self.postings = postings
+        self.corpus_built_at = corpus_built_at
+
+    @classmethod
+    def build(cls, documents, passage_chars=800, passage_overlap=200, k1=1.2, b=0.75, corpus_built_at=None):
+        """Build an index from (url, text) pairs"""
+        urls = []
+        passage_pages = array('I')
+        passage_starts = array('I')
+        passage_ends = array('I')
+        passage_terms = []
+        for url, text in documents:
+            page_id = len(urls)
+            urls.append(url)
+            # URL path words count as content of every passage ("room-reservation", "libguides", ...)
+            url_terms = tokenize(url)
+            for start, end in split_passages(text, passage_chars, passage_overlap) or [(0, 0)]:
+                passage_pages.append(page_id)
+                passage_starts.append(start)
+                passage_ends.append(end)
+                passage_terms.append(Counter(url_terms + tokenize(text[start:end])))
+
+        lengths = [sum(terms.values()) for terms in passage_terms]
+        avg_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+
+        raw = {}
+        for passage_id, terms in enumerate(passage_terms):
+            norm = k1 * (1 - b + b * lengths[passage_id] / avg_length) if avg_length else k1
+            for term, tf in terms.items():
+                raw.setdefault(term, []).append((passage_id, tf * (k1 + 1) / (tf + norm)))
+
+        n_passages = len(passage_terms)
+        postings = {}
+        for term, entries in raw.items():
+            idf = math.log(1 + (n_passages - len(entries) + 0.5) / (len(entries) + 0.5))
+            entries.sort(key=lambda entry: entry[1], reverse=True)
+            postings[term] = (
+                array('I', [passage_id for passage_id, _ in entries]),
+                array('f', [weight * idf for _, weight in entries]),
+            )
+
+        return cls(urls, passage_pages, passage_starts, passage_ends, postings, corpus_built_at)
+
+    @classmethod
+    def from_corpus(cls, corpus, passage_chars=800, passage_overlap=200):
+        """Build an index over every page of a corpus snapshot"""
+        return cls.build(corpus.items(), passage_chars, passage_overlap, corpus_built_at=corpus.built_at)
+
+    def __len__(self):
+        return len(self.urls)
+
+    def _score(self, query):
+        """Accumulate BM25 scores for passages in the first MAX_POSTINGS_SCANNED postings of each query term"""
+        scores = {}
+        for term in set(tokenize(query)):
+            entry = self.postings.get(term)
+            if entry is None:
+                continue
+            passage_ids, weights = entry
+            limit = min(len(passage_ids), MAX_POSTINGS_SCANNED)
+            for i in range(limit):
+                passage_id = passage_ids[i]
+                scores[passage_id] = scores.get(passage_id, 0.0) + weights[i]
+        return scores
+
+    def search_passages(self, query, k=8):
+        """Return the top-k passages for a query, best first (text is left as None)"""
+        top = heapq.nlargest(k, self._score(query).items(), key=lambda item: item[1])
+        return [Passage(self.urls[self.passage_pages[passage_id]], self.passage_starts[passage_id],
+                        self.passage_ends[passage_id], None, score)
+                for passage_id, score in top]
+
+    def search(self, query, k=8):
+        """Return the top-k (url, score) pairs for a query, scoring each page by its best passage"""
+        page_scores = {}
+        for passage_id, score in self._score(query).items():
+            page_id = self.passage_pages[passage_id]
+            if score > page_scores.get(page_id, 0.0):
+                page_scores[page_id] = score
+
+        top = heapq.nlargest(k, page_scores.items(), key=lambda item: item[1])
+        return [(self.urls[page_id], score) for page_id, score in top]
+
+    def save(self, path):
+        """Write the index to disk"""
+        state = {
+            'version': INDEX_VERSION,
+            'corpus_built_at': self.corpus_built_at,
+            'urls': self.urls,
+            'passage_pages': self.passage_pages,
+            'passage_starts': self.passage_starts,
+            'passage_ends': self.passage_ends,
+            'postings': self.postings,
+        }
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read an index written by save(), or return None if it is missing or outdated"""
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+        if state.get('version') != INDEX_VERSION:
+            return None
+        return cls(state['urls'], state['passage_pages'], state['passage_starts'],
+                   state['passage_ends'], state['postings'], state['corpus_built_at'])
+
+
+def load_or_build_index(corpus, path, passage_chars=800, passage_overlap=200):
+    """Load the saved index for this corpus snapshot, or build one in memory"""
+    if corpus is None:
+        return None
+    index = SearchIndex.load(path)
+    if index is None or index.corpus_built_at != corpus.built_at:
+        index = SearchIndex.from_corpus(corpus, passage_chars, passage_overlap)
+    return index
+
+
+def main():
+    from api_config import CORPUS_PATH, SEARCH_INDEX_PATH, PASSAGE_CHARS, PASSAGE_OVERLAP
+    from corpus import Corpus
+
+    corpus_file = sys.argv[1] if len(sys.argv) > 1 else CORPUS_PATH
+    output_file = sys.argv[2] if len(sys.argv) > 2 else SEARCH_INDEX_PATH
+
+    print("FIFI Search Index Builder")
+    print("=" * 50)
+
+    start = time.time()
+    corpus = Corpus(corpus_file)
+    index = SearchIndex.from_corpus(corpus, PASSAGE_CHARS, PASSAGE_OVERLAP)
+    index.save(output_file)
+
+    print(f"Indexed {len(index)} pages as {len(index.passage_pages)} passages, {len(index.postings)} terms")
+    print(f"Saved to {output_file} in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
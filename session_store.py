@@ -0,0 +1,226 @@
+"""
+FIFI Session Store - Bounded, expiring storage for conversation histories
+Sessions expire after an idle timeout and the least recently used ones are
+evicted once the store passes its session or size cap. The memory backend is
+per-process; the SQLite backend (WAL mode) lets several worker processes share
+the same conversations. Other backends can subclass SessionStore.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+
+def history_size(history):
+    """Approximate the memory used by a history as the length of its message text"""
+    return sum(len(message.get('content') or '') for message in history)
+
+
+class SessionStore(ABC):
+    """Interface every session backend implements"""
+
+    @abstractmethod
+    def get(self, session_id):
+        """Return a copy of a session's history ([] for new or expired sessions)"""
+
+    @abstractmethod
+    def append(self, session_id, messages, keep=10, compact=None):
+        """Append messages to a session's history, keeping only the last `keep` messages.
+
+        If compact is given it is called with the full history instead, and
+        returns the history to store (e.g. older turns folded into a summary).
+        """
+
+    @abstractmethod
+    def clear(self, session_id):
+        """Forget a session's history"""
+
+    @abstractmethod
+    def stats(self):
+        """Return counters describing the store"""
+
+
+class MemorySessionStore(SessionStore):
+    """In-process LRU store with idle expiry and session/size caps"""
+
+    def __init__(self, idle_timeout=30 * 60, max_sessions=10000, max_bytes=50 * 1024 * 1024):
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.expired = 0
+        self.evicted = 0
+        self._sessions = OrderedDict()  # session_id -> (history, last_access, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        # Sessions are kept in access order, so expired ones are at the front
+        while self._sessions:
+            session_id, (_, last_access, size) = next(iter(self._sessions.items()))
+            if now - last_access < self.idle_timeout:
+                break
+            del self._sessions[session_id]
+            self._bytes -= size
+            self.expired += 1
+
+    def _store(self, session_id, history, now):
+        old = self._sessions.pop(session_id, None)
+        if old is not None:
+            self._bytes -= old[2]
+        size = history_size(history)
+        self._sessions[session_id] = (history, now, size)
+        self._bytes += size
+        while len(self._sessions) > self.max_sessions or (self._bytes > self.max_bytes and len(self._sessions) > 1):
+            _, (_, _, evicted_size) = self._sessions.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evicted += 1
+
+    def get(self, session_id):
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return []
+            history, _, size = entry
+            self._sessions[session_id] = (history, now, size)
+            self._sessions.move_to_end(session_id)
+            return list(history)
+
+    def append(self, session_id, messages, keep=10, compact=None):
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            entry = self._sessions.get(session_id)
+            history = (entry[0] if entry else []) + list(messages)
+            self._store(session_id, compact(history) if compact else history[-keep:], now)
+
+    def clear(self, session_id):
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is not None:
+                self._bytes -= entry[2]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'bytes': self._bytes,
+                'expired': self.expired,
+                'evicted': self.evicted,
+            }
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite-backed store shared by every worker process using the same database file"""
+
+    SWEEP_INTERVAL = 60  # seconds between expiry/cap sweeps
+
+    def __init__(self, path, idle_timeout=30 * 60, max_sessions=10000, max_bytes=50 * 1024 * 1024,
+                 touch_interval=5):
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.touch_interval = touch_interval
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.expired = 0
+        self.evicted = 0
+        self._last_sweep = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                history TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated_at)')
+
+    def _write(self, session_id, history, now):
+        self._conn.execute(
+            'INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)',
+            (session_id, json.dumps(history), now, history_size(history))
+        )
+
+    def _sweep(self, now):
+        """Drop expired sessions, then the least recently used ones over the caps"""
+        if now - self._last_sweep < self.SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+
+        cursor = self._conn.execute('DELETE FROM sessions WHERE updated_at < ?', (now - self.idle_timeout,))
+        self.expired += cursor.rowcount
+
+        count, total = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions').fetchone()
+        if count <= self.max_sessions and total <= self.max_bytes:
+            return
+        rows = self._conn.execute('SELECT session_id, size FROM sessions ORDER BY updated_at').fetchall()
+        for session_id, size in rows[:-1]:
+            if count <= self.max_sessions and total <= self.max_bytes:
+                break
+            self._conn.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+            count -= 1
+            total -= size
+            self.evicted += 1
+
+    def get(self, session_id):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT history, updated_at FROM sessions WHERE session_id = ?', (session_id,)
+            ).fetchone()
+            if row is None or now - row[1] >= self.idle_timeout:
+                return []
+            # Each turn rewrites its session anyway, so the idle clock only needs to be roughly right
+            if now - row[1] >= self.touch_interval:
+                self._conn.execute('UPDATE sessions SET updated_at = ? WHERE session_id = ?', (now, session_id))
+            return json.loads(row[0])
+
+    def append(self, session_id, messages, keep=10, compact=None):
+        now = time.time()
+        with self._lock:
+            # Read-modify-write in one transaction so concurrent workers don't lose turns
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute(
+                    'SELECT history, updated_at FROM sessions WHERE session_id = ?', (session_id,)
+                ).fetchone()
+                history = json.loads(row[0]) if row and now - row[1] < self.idle_timeout else []
+                history.extend(messages)
+                self._write(session_id, compact(history) if compact else history[-keep:], now)
+                self._sweep(now)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def clear(self, session_id):
+        with self._lock:
+            self._conn.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+
+    def stats(self):
+        with self._lock:
+            count, total = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions').fetchone()
+        return {
+            'sessions': count,
+            'bytes': total,
+            'expired': self.expired,
+            'evicted': self.evicted,
+        }
+
+
+def open_session_store(backend, path=None, idle_timeout=30 * 60, max_sessions=10000, max_bytes=50 * 1024 * 1024,
+                       touch_interval=5):
+    """Create the session store for a backend name: "memory" or "sqlite" """
+    if backend == 'memory':
+        return MemorySessionStore(idle_timeout, max_sessions, max_bytes)
+    if backend == 'sqlite':
+        return SQLiteSessionStore(path, idle_timeout, max_sessions, max_bytes, touch_interval)
+    raise ValueError(f"Unknown session backend: {backend!r} (expected 'memory' or 'sqlite')")
@@ -0,0 +1,213 @@
+"""
+FIFI Single Flight - Collapse concurrent identical calls into one
+While a call for a key is running, further calls with the same key wait for
+it and share its result (or exception) instead of doing the work again. Used
+for page downloads keyed by URL and for model calls keyed by the normalized
+question. Streaming responses are shared chunk by chunk through SharedStream.
+"""
+
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Thread-based single-flight group with counters for collapsed calls"""
+
+    def __init__(self):
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def do(self, key, func, *args, **kwargs):
+        """Run func(*args, **kwargs), or wait for the identical call already running for key"""
+        with self._lock:
+            self.calls += 1
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _Call()
+                self.executions += 1
+            else:
+                self.collapsed += 1
+
+        if leader:
+            try:
+                call.result = func(*args, **kwargs)
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._in_flight[key]
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def share(self, key, make_stream):
+        """Return a SharedStream over make_stream(), or join the one already running for key"""
+        def finished():
+            with self._lock:
+                del self._in_flight[key]
+
+        with self._lock:
+            self.calls += 1
+            stream = self._in_flight.get(key)
+            if stream is not None:
+                self.collapsed += 1
+                return stream
+            self.executions += 1
+            stream = self._in_flight[key] = SharedStream(on_done=finished)
+
+        try:
+            stream.start(make_stream())
+        except BaseException:
+            stream.close()
+            raise
+        return stream
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'executions': self.executions,
+                'collapsed': self.collapsed,
+                'in_flight': len(self._in_flight),
+            }
+
+
+class SharedStream:
+    """Chunks from one producer replayed to every reader, including ones that join late.
+
+    The producer runs on its own thread, so it finishes (and e.g. fills the
+    answer cache) even if the reader that started it goes away.
+    """
+
+    def __init__(self, on_done=None):
+        self._chunks = []
+        self._finished = False
+        self._cond = threading.Condition()
+        self._on_done = on_done
+
+    def start(self, source):
+        threading.Thread(target=self._pump, args=(source,), daemon=True).start()
+
+    def close(self):
+        """Finish a stream that never got a producer"""
+        self._pump(())
+
+    def _pump(self, source):
+        try:
+            for chunk in source:
+                with self._cond:
+                    self._chunks.append(chunk)
+                    self._cond.notify_all()
+        finally:
+            if self._on_done is not None:
+                self._on_done()
+            with self._cond:
+                self._finished = True
+                self._cond.notify_all()
+
+    def __iter__(self):
+        i = 0
+        while True:
+            with self._cond:
+                while i >= len(self._chunks) and not self._finished:
+                    self._cond.wait()
+                if i >= len(self._chunks):
+                    return
+                chunk = self._chunks[i]
+            i += 1
+            yield chunk
+
+
+class AsyncSingleFlight:
+    """asyncio version of SingleFlight; all callers must share one event loop"""
+
+    def __init__(self):
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+        self._in_flight = {}
+
+    async def do(self, key, make_coroutine):
+        """Await make_coroutine(), or the identical call already running for key"""
+        self.calls += 1
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.collapsed += 1
+        else:
+            self.executions += 1
+            task = asyncio.ensure_future(make_coroutine())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # Shield so a cancelled caller doesn't cancel the call for everyone else
+        return await asyncio.shield(task)
+
+    def share(self, key, make_stream):
+        """Return an AsyncSharedStream over the async iterator make_stream(), or join the running one"""
+        self.calls += 1
+        stream = self._in_flight.get(key)
+        if stream is not None:
+            self.collapsed += 1
+            return stream
+        self.executions += 1
+        stream = self._in_flight[key] = AsyncSharedStream(on_done=lambda: self._in_flight.pop(key, None))
+        stream.start(make_stream())
+        return stream
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'executions': self.executions,
+            'collapsed': self.collapsed,
+            'in_flight': len(self._in_flight),
+        }
+
+
+class AsyncSharedStream:
+    """asyncio version of SharedStream; the producer runs as its own task"""
+
+    def __init__(self, on_done=None):
+        self._chunks = []
+        self._finished = False
+        self._changed = asyncio.Event()
+        self._on_done = on_done
+        self._task = None
+
+    def start(self, source):
+        self._task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source):
+        try:
+            async for chunk in source:
+                self._chunks.append(chunk)
+                self._changed.set()
+        finally:
+            if self._on_done is not None:
+                self._on_done()
+            self._finished = True
+            self._changed.set()
+
+    async def __aiter__(self):
+        i = 0
+        while True:
+            while i >= len(self._chunks) and not self._finished:
+                self._changed.clear()
+                await self._changed.wait()
+            if i >= len(self._chunks):
+                return
+            yield self._chunks[i]
+            i += 1
@@ -0,0 +1,197 @@
+"""
+FIFI Vector Index - Local dense-vector retrieval over page passages
+Passages are embedded with hashed word unigrams and bigrams weighted by TF-IDF,
+so no model download or network call is needed. All vectors live in one
+contiguous float32 matrix; a query is one matrix-vector product plus a partial
+sort. Needs NumPy - without it dense retrieval is simply unavailable.
+"""
+
+import math
+import os
+import sys
+import time
+import zlib
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:  # dense retrieval is optional
+    np = None
+
+from passages import Passage
+from search_index import tokenize
+
+VECTOR_INDEX_VERSION = 1
+
+
+def hashed_features(text, dim):
+    """Map text to {bucket: signed count} using hashed word unigrams and bigrams"""
+    terms = tokenize(text)
+    features = Counter()
+    for i, term in enumerate(terms):
+        grams = (term, terms[i - 1] + ' ' + term) if i else (term,)
+        for gram in grams:
+            h = zlib.crc32(gram.encode('utf-8'))
+            features[h % dim] += 1 if h & 0x80000000 else -1
+    return features
+
+
+class VectorIndex:
+    """Dense TF-IDF vectors for the passages of a SearchIndex, one float32 row per passage"""
+
+    def __init__(self, matrix, idf, passages, corpus_built_at=None):
+        self.matrix = matrix
+        self.idf = idf
+        self.passages = passages
+        self.corpus_built_at = corpus_built_at
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1]
+
+    @classmethod
+    def build(cls, search_index, page_text, dim=256):
+        """Embed every passage of a search index; page_text(url) returns the page's text"""
+        n_passages = len(search_index.passage_pages)
+        rows, cols, values = [], [], []
+        texts = {}
+        for passage_id in range(n_passages):
+            url = search_index.urls[search_index.passage_pages[passage_id]]
+            if url not in texts:
+                texts = {url: page_text(url) or ''}
+            start = search_index.passage_starts[passage_id]
+            end = search_index.passage_ends[passage_id]
+            for bucket, count in hashed_features(url + ' ' + texts[url][start:end], dim).items():
+                rows.append(passage_id)
+                cols.append(bucket)
+                # Sublinear term frequency, keeping the hash sign
+                values.append(math.copysign(1 + math.log(abs(count)), count) if count else 0.0)
+
+        matrix = np.zeros((n_passages, dim), dtype=np.float32)
+        matrix[np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)] = values
+
+        df = np.count_nonzero(matrix, axis=0)
+        idf = (np.log((n_passages + 1) / (df + 1)) + 1).astype(np.float32)
+        matrix *= idf
+        norms = np.linalg.norm(matrix, axis=1)
+        norms[norms == 0] = 1
+        matrix /= norms[:, None]
+
+        passages = (search_index.urls, search_index.passage_pages,
+                    search_index.passage_starts, search_index.passage_ends)
+        return cls(np.ascontiguousarray(matrix), idf, passages, search_index.corpus_built_at)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def embed(self, text):
+        """Return the normalized query vector for some text"""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for bucket, count in hashed_features(text, self.dim).items():
+            if count:
+                vector[bucket] = math.copysign(1 + math.log(abs(count)), count)
+        vector *= self.idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _top(self, query, k):
+        """Return (passage ids, scores) of the k most similar passages, best first"""
+        scores = self.matrix @ self.embed(query)
+        k = min(k, len(scores))
+        if k == 0:
+            return [], []
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        top = top[scores[top] > 0]
+        return top.tolist(), scores[top].tolist()
+
+    def search_passages(self, query, k=8):
+        """Return the top-k passages for a query, best first (text is left as None)"""
+        urls, pages, starts, ends = self.passages
+        ids, scores = self._top(query, k)
+        return [Passage(urls[pages[i]], starts[i], ends[i], None, score) for i, score in zip(ids, scores)]
+
+    def search(self, query, k=8):
+        """Return the top-k (url, score) pairs for a query, scoring each page by its best passage"""
+        results = []
+        seen = set()
+        for passage in self.search_passages(query, k * 4):
+            if passage.url not in seen:
+                seen.add(passage.url)
+                results.append((passage.url, passage.score))
+            if len(results) == k:
+                break
+        return results
+
+    def save(self, path):
+        """Write the index to disk as a NumPy archive"""
+        urls, pages, starts, ends = self.passages
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, version=VECTOR_INDEX_VERSION, matrix=self.matrix, idf=self.idf,
+                 urls=np.array(urls, dtype=object), pages=np.array(pages, dtype=np.uint32),
+                 starts=np.array(starts, dtype=np.uint32), ends=np.array(ends, dtype=np.uint32),
+                 corpus_built_at=np.float64(self.corpus_built_at or 0.0))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read an index written by save(), or return None if it is missing or outdated"""
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=True) as data:
+            if int(data['version']) != VECTOR_INDEX_VERSION:
+                return None
+            passages = (data['urls'].tolist(), data['pages'].tolist(),
+                        data['starts'].tolist(), data['ends'].tolist())
+            return cls(np.ascontiguousarray(data['matrix']), data['idf'], passages,
+                       float(data['corpus_built_at']))
+
+
+def fuse_rankings(rankings, k=60):
+    """Reciprocal rank fusion: merge several best-first lists of keys into (key, score) pairs"""
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def load_or_build_vector_index(search_index, corpus, path, dim=256):
+    """Load the saved vector index for this corpus snapshot, or build one in memory"""
+    if np is None or search_index is None or corpus is None:
+        return None
+    index = VectorIndex.load(path)
+    if index is None or index.corpus_built_at != corpus.built_at or index.dim != dim:
+        index = VectorIndex.build(search_index, corpus.get, dim)
+    return index
+
+
+def main():
+    from api_config import CORPUS_PATH, SEARCH_INDEX_PATH, VECTOR_INDEX_PATH, VECTOR_DIM
+    from api_config import PASSAGE_CHARS, PASSAGE_OVERLAP
+    from corpus import Corpus
+    from search_index import load_or_build_index
+
+    if np is None:
+        print("NumPy is required for the vector index: pip install numpy")
+        sys.exit(1)
+
+    corpus_file = sys.argv[1] if len(sys.argv) > 1 else CORPUS_PATH
+    output_file = sys.argv[2] if len(sys.argv) > 2 else VECTOR_INDEX_PATH
+
+    print("FIFI Vector Index Builder")
+    print("=" * 50)
+
+    start = time.time()
+    corpus = Corpus(corpus_file)
+    search_index = load_or_build_index(corpus, SEARCH_INDEX_PATH, PASSAGE_CHARS, PASSAGE_OVERLAP)
+    index = VectorIndex.build(search_index, corpus.get, VECTOR_DIM)
+    index.save(output_file)
+
+    size_mb = index.matrix.nbytes / (1024 * 1024)
+    print(f"Embedded {len(index)} passages into {VECTOR_DIM} dimensions ({size_mb:.1f} MB)")
+    print(f"Saved to {output_file} in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()